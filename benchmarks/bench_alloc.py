@@ -0,0 +1,206 @@
+# BSD 3-Clause License
+
+# Copyright (c) 2022-Present, nxtlo
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+
+# * Neither the name of the copyright holder nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""Measure the memory allocated per received message while the gateway decodes it, Using `tracemalloc`.
+
+`before` replays the previous decode path, Which copied every identity frame into bytes to look it up,
+Unpacked every signal frame into a tuple and copied the host name out of the identity before decoding it.
+`after` is the gateway's current decode path.
+
+Allocations that are freed before the batch is dispatched show up only as much as they overlap, So this
+reports the peak traced memory of decoding a batch, Divided by the number of messages in it.
+
+* `known` - Registered devices whose identities are cached, Sending the signal they last sent.
+* `changed` - Registered devices whose identities are cached, Sending a different signal.
+* `unknown` - Devices that aren't registered yet, Their identities are fully decoded.
+
+Run from the repository root.
+
+```sh
+python -m benchmarks.bench_alloc --batches 200 --batch-size 256
+```
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import socket
+import struct
+import tracemalloc
+import typing
+
+import zmq
+
+from message_service import codecs, devices, enums, gateway, registry
+
+if typing.TYPE_CHECKING:
+    import collections.abc as collections
+
+_SIGNAL = struct.Struct("!b")
+_SIGNALS_BY_VALUE = {signal.value: signal for signal in enums.Signal}
+_HEADER = struct.Struct("!4s6sB")
+
+
+class _LegacyBinaryCodec(codecs.BinaryCodec):
+    __slots__ = ()
+
+    def decode_identity(self, buffer: bytes | bytearray | memoryview) -> codecs.Identity:
+        ip_address, mac_address, size = _HEADER.unpack_from(buffer)
+        offset = _HEADER.size
+        return codecs.Identity(
+            bytes(buffer[offset : offset + size]).decode("UTF-8"),
+            socket.inet_ntop(socket.AF_INET, ip_address),
+            mac_address.hex(":"),
+        )
+
+
+class _LegacyRegistry(registry.DeviceRegistry):
+    """The registry with its identity cache keyed by the copied identity bytes."""
+
+    __slots__ = ("_copied",)
+
+    def __init__(self, codec: codecs.BinaryCodec) -> None:
+        super().__init__(codec)
+        self._copied: dict[bytes, str] = {}
+
+    def resolve_copied(self, identity: bytes, signal: enums.Signal) -> devices.DeviceView:
+        host_name = self._copied.get(identity)
+        if host_name is None:
+            decoded = self._codec.decode_identity(identity)
+            view = self._views.get(decoded.host_name)
+            if view is None:
+                return devices.DeviceView(decoded.host_name, decoded.ip_address, decoded.mac_address, signal)
+
+            if view.ip_address != decoded.ip_address or view.mac_address != decoded.mac_address:
+                return devices.DeviceView(view.host_name, decoded.ip_address, decoded.mac_address, signal)
+
+            self._copied[identity] = view.host_name
+        else:
+            view = self._views[host_name]
+
+        if view.signal is signal:
+            return view
+
+        return devices.DeviceView(view.host_name, view.ip_address, view.mac_address, signal)
+
+
+def _legacy_decode_batch(batch: list[list[zmq.Frame]], devices_: registry.DeviceRegistry) -> list[devices.DeviceView]:
+    resolve = typing.cast(_LegacyRegistry, devices_).resolve_copied
+    return [
+        resolve(identity, _SIGNALS_BY_VALUE[_SIGNAL.unpack_from(frame.bytes)[0]])
+        for data in batch
+        for identity in (data[0].bytes,)
+        for frame in data[1:]
+    ]
+
+
+Decoder = typing.Callable[[list[list[zmq.Frame]], registry.DeviceRegistry], list[devices.DeviceView]]
+
+_PATHS: dict[str, tuple[type[registry.DeviceRegistry], codecs.BinaryCodec, Decoder]] = {
+    "before": (_LegacyRegistry, _LegacyBinaryCodec(), _legacy_decode_batch),
+    "after": (registry.DeviceRegistry, codecs.BINARY, gateway._decode_batch),
+}
+
+
+def _make_registry(
+    cls: type[registry.DeviceRegistry], codec: codecs.BinaryCodec, decode: Decoder, fleet: list[devices.Device]
+) -> registry.DeviceRegistry:
+    devices_ = cls(codec)
+    hello = codecs.encode_signal(enums.Signal.HELLO)
+    # The first message registers the device, The second one caches its identity, As in the gateway.
+    for _ in range(2):
+        for view in decode([[zmq.Frame(codec.encode_identity(device)), zmq.Frame(hello)] for device in fleet], devices_):
+            devices_.put(view)
+    return devices_
+
+
+def _measure(
+    decode: Decoder,
+    devices_: registry.DeviceRegistry,
+    messages: collections.Iterator[list[bytes]],
+    batches: int,
+    batch_size: int,
+) -> float:
+    total = 0
+    tracemalloc.start()
+    try:
+        for _ in range(batches):
+            # Fresh frames for every batch, Since frames cache the bytes they were asked for.
+            batch = [[zmq.Frame(part) for part in message] for message in itertools.islice(messages, batch_size)]
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            views = decode(batch, devices_)
+            _, peak = tracemalloc.get_traced_memory()
+            total += peak - before
+            del views, batch
+    finally:
+        tracemalloc.stop()
+    return total / (batches * batch_size)
+
+
+def _messages(fleet: list[devices.Device], signals: int, signal: enums.Signal) -> collections.Iterator[list[bytes]]:
+    frame = codecs.encode_signal(signal)
+    return itertools.cycle([[codecs.BINARY.encode_identity(device), *(frame,) * signals] for device in fleet])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batches", type=int, default=200, help="Batches measured per row.")
+    parser.add_argument("--batch-size", type=int, default=256, help="Messages per batch.")
+    parser.add_argument("--devices", type=int, default=1_000, help="Registered devices.")
+    parser.add_argument("--signals", type=int, default=1, help="Signal frames per message.")
+    args = parser.parse_args()
+
+    fleet = [devices.Device(codec=codecs.BINARY) for _ in range(args.devices)]
+    strangers = [devices.Device(codec=codecs.BINARY) for _ in range(args.devices)]
+    scenarios = {
+        "known": (fleet, enums.Signal.HELLO),
+        "changed": (fleet, enums.Signal.RESTART),
+        "unknown": (strangers, enums.Signal.HELLO),
+    }
+
+    print(f"{'scenario':<10} {'before B/msg':>14} {'after B/msg':>14} {'saved':>8}")
+    for scenario, (senders, signal) in scenarios.items():
+        row = {
+            path: _measure(
+                decode,
+                _make_registry(cls, codec, decode, fleet),
+                _messages(senders, args.signals, signal),
+                args.batches,
+                args.batch_size,
+            )
+            for path, (cls, codec, decode) in _PATHS.items()
+        }
+        saved = 1 - row["after"] / row["before"] if row["before"] else 0.0
+        print(f"{scenario:<10} {row['before']:>14,.1f} {row['after']:>14,.1f} {saved:>8.1%}")
+
+
+if __name__ == "__main__":
+    main()
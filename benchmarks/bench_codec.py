@@ -0,0 +1,90 @@
+# BSD 3-Clause License
+
+# Copyright (c) 2022-Present, nxtlo
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+
+# * Neither the name of the copyright holder nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Compare the encode / decode throughput and bytes-on-wire of the available codecs.
+
+`encode/s` encodes the identity from scratch, `cached/s` builds a message from the device's cached identity.
+
+Run from the repository root.
+
+```sh
+python -m benchmarks.bench_codec --number 200000
+```
+"""
+
+from __future__ import annotations
+
+import argparse
+import timeit
+
+import zmq
+
+from message_service import codecs, devices, enums
+
+
+def bench(codec_name: str, number: int) -> dict[str, float]:
+    codec = codecs.get_codec(codec_name)
+    device = devices.Device(
+        host_name="web-22.example.internal",
+        ip_address="172.17.8.209",
+        mac_address="85:03:45:1c:b6:9b",
+        codec=codec,
+    )
+    # Received frames own their own copies of the data.
+    frames = [zmq.Frame(frame.bytes) for frame in device._unbox(enums.Signal.RESTART)]
+    assert devices.deserialize_devices(frames, codec)[0].host_name == device.host_name
+
+    encode = timeit.timeit(lambda: codec.encode_identity(device), number=number)
+    cached = timeit.timeit(lambda: device._unbox(enums.Signal.RESTART), number=number)
+    decode = timeit.timeit(lambda: devices.deserialize_devices(frames, codec), number=number)
+    return {
+        "bytes": sum(len(frame.bytes) for frame in frames),
+        "encode_per_sec": number / encode,
+        "cached_encode_per_sec": number / cached,
+        "decode_per_sec": number / decode,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=100_000, help="Iterations per measurement.")
+    args = parser.parse_args()
+
+    print(f"{'codec':<8} {'bytes':>6} {'encode/s':>12} {'cached/s':>12} {'decode/s':>12}")
+    for name in ("binary", "json"):
+        r = bench(name, args.number)
+        print(
+            f"{name:<8} {r['bytes']:>6} {r['encode_per_sec']:>12,.0f} "
+            f"{r['cached_encode_per_sec']:>12,.0f} {r['decode_per_sec']:>12,.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+# BSD 3-Clause License
+
+# Copyright (c) 2022-Present, nxtlo
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+
+# * Neither the name of the copyright holder nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Load test the gateway at different high-water marks.
+
+Devices push signals without blocking for a fixed duration while the gateway does a fixed
+amount of work per message. Sends that would block because the queue is full are counted as drops.
+
+Run from the repository root.
+
+```sh
+python -m benchmarks.bench_hwm --hwm 1 100 1000 100000 --devices 32 --duration 3
+```
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+import zmq
+
+from message_service import config, devices, enums, gateway
+
+
+class _CountingGateway(gateway.Gateway):
+    __slots__ = ("received", "_work")
+
+    def __init__(self, address: str, socket_config: config.SocketConfig, work: float) -> None:
+        super().__init__(address, socket_config=socket_config)
+        self.received = 0
+        self._work = work
+
+    def _dispatch_batch(self, batch: list[list[zmq.Frame]], signal: enums.Signal | None = None) -> None:
+        self.received += len(batch)
+        if self._work:
+            # Simulate dispatch work.
+            deadline = time.perf_counter() + self._work * len(batch)
+            while time.perf_counter() < deadline:
+                pass
+
+
+async def _flood(device: devices.Device, until: float) -> tuple[int, int]:
+    socket = device._get_socket()
+    frames = device._unbox(enums.Signal.HELLO)
+    sent = dropped = 0
+    while time.monotonic() < until:
+        try:
+            await socket.send_multipart(frames, zmq.NOBLOCK, copy=False)
+            sent += 1
+        except zmq.Again:
+            dropped += 1
+            await asyncio.sleep(0)
+
+        if (sent + dropped) % 64 == 0:
+            await asyncio.sleep(0)
+
+    return sent, dropped
+
+
+async def run(hwm: int, args: argparse.Namespace) -> dict[str, float]:
+    socket_config = config.SocketConfig(send_hwm=hwm, recv_hwm=hwm)
+    server = _CountingGateway(args.endpoint, socket_config=socket_config, work=args.work_us / 1e6)
+    server_task = asyncio.create_task(server.open())
+    await asyncio.sleep(0.1)
+
+    fleet = [devices.Device(endpoint=args.endpoint, socket_config=socket_config) for _ in range(args.devices)]
+    for device in fleet:
+        await device.open()
+
+    start = time.monotonic()
+    results = await asyncio.gather(*(_flood(device, start + args.duration) for device in fleet))
+    # Give the gateway a moment to drain whatever is still queued.
+    await asyncio.sleep(0.5)
+    elapsed = time.monotonic() - start
+
+    server_task.cancel()
+    try:
+        await server_task
+    except asyncio.CancelledError:
+        pass
+
+    await server.close()
+    for device in fleet:
+        device._get_socket().close(linger=0)
+
+    sent = sum(result[0] for result in results)
+    dropped = sum(result[1] for result in results)
+    return {
+        "hwm": hwm,
+        "sent": sent,
+        "dropped": dropped,
+        "received": server.received,
+        "received_per_sec": server.received / elapsed,
+        "drop_ratio": dropped / max(sent + dropped, 1),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--hwm", type=int, nargs="+", default=[1, 100, 1_000, 100_000])
+    parser.add_argument("--devices", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=2.0, help="Seconds to flood the gateway for.")
+    parser.add_argument("--work-us", type=float, default=2.0, help="Simulated gateway work per message.")
+    parser.add_argument("--endpoint", default="ipc:///tmp/batteries-bench-hwm")
+    args = parser.parse_args()
+
+    print(f"{'hwm':>8} {'sent':>10} {'dropped':>10} {'received':>10} {'recv/s':>12} {'drop %':>7}")
+    for hwm in args.hwm:
+        r = await run(hwm, args)
+        print(
+            f"{r['hwm']:>8} {r['sent']:>10} {r['dropped']:>10} {r['received']:>10} "
+            f"{r['received_per_sec']:>12,.0f} {r['drop_ratio'] * 100:>6.1f}%"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,325 @@
+# BSD 3-Clause License
+
+# Copyright (c) 2022-Present, nxtlo
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+
+# * Neither the name of the copyright holder nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Load generation and benchmark harness.
+
+Spawns `--devices` simulated devices spread across `--processes` worker processes which drive a signal mix
+against a gateway running in this process, Then reports throughput, End-to-end latency
+(from the device sending a signal to the gateway dispatching it), Gateway CPU usage and RSS as JSON.
+
+Latencies are measured with `time.monotonic_ns`, Which is system-wide on Linux so send and dispatch
+timestamps taken in different processes are comparable.
+
+`--loop` picks the event loop the gateway and the device processes run on. Given a comma separated list,
+Each loop is benchmarked in turn and the throughput and latency difference of each against the first is reported.
+
+Run from the repository root.
+
+```sh
+python -m benchmarks.bench_load --devices 1000 --processes 4 --rate 10 --duration 10 \\
+    --mix HELLO=0.9,RESTART=0.05,DHCP_IP=0.05 --endpoint ipc:///tmp/batteries-bench --output result.json
+python -m benchmarks.bench_load --devices 1000 --processes 4 --rate 0 --loop asyncio,uvloop
+```
+"""
+
+from __future__ import annotations
+
+import argparse
+import array
+import asyncio
+import collections
+import json
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import time
+import typing
+
+from message_service import codecs, devices, enums, gateway, utils
+
+if typing.TYPE_CHECKING:
+    import multiprocessing.queues
+    import multiprocessing.synchronize
+
+
+def _parse_mix(mix: str) -> tuple[list[enums.Signal], list[float]]:
+    signals: list[enums.Signal] = []
+    weights: list[float] = []
+    for entry in mix.split(","):
+        name, _, weight = entry.partition("=")
+        signals.append(enums.Signal[name.strip().upper()])
+        weights.append(float(weight or 1))
+    return signals, weights
+
+
+async def _drive(device: devices.Device, args: argparse.Namespace, until: float) -> array.array[int]:
+    signals, weights = _parse_mix(args.mix)
+    interval = 1 / args.rate if args.rate else 0
+    sent = array.array("q")
+
+    sent.append(time.monotonic_ns())
+    await device.signal(enums.Signal.OPEN)
+
+    while time.monotonic() < until:
+        signal = random.choices(signals, weights)[0]
+        sent.append(time.monotonic_ns())
+        await device.signal(signal)
+        await asyncio.sleep(interval)
+
+    sent.append(time.monotonic_ns())
+    await device.close()
+    return sent
+
+
+async def _run_worker(
+    index: int, count: int, args: argparse.Namespace, start: multiprocessing.synchronize.Event
+) -> dict[str, array.array[int]]:
+    codec = codecs.get_codec(args.codec)
+    pool = None
+    if args.pool:
+        from message_service import pool as pool_
+
+        pool = pool_.DevicePool(args.endpoint, size=args.pool)
+        await pool.open()
+
+    fleet = [
+        devices.Device(
+            host_name=f"bench-{index}-{n}",
+            ip_address=f"10.{index % 256}.{n // 256 % 256}.{n % 256}",
+            mac_address=f"02:00:{index % 256:02x}:{n // 65536 % 256:02x}:{n // 256 % 256:02x}:{n % 256:02x}",
+            endpoint=args.endpoint,
+            codec=codec,
+            pool=pool,
+        )
+        for n in range(count)
+    ]
+
+    for device in fleet:
+        await device.open()
+
+    await asyncio.get_running_loop().run_in_executor(None, start.wait)
+    until = time.monotonic() + args.duration
+    results = await asyncio.gather(*(_drive(device, args, until) for device in fleet))
+    if pool is not None:
+        await pool.close()
+
+    return {device.host_name: sent for device, sent in zip(fleet, results)}
+
+
+def _worker(
+    index: int,
+    count: int,
+    args: argparse.Namespace,
+    start: multiprocessing.synchronize.Event,
+    results: multiprocessing.queues.Queue[dict[str, array.array[int]]],
+) -> None:
+    results.put(utils.run(_run_worker(index, count, args, start), loop_factory=args.loop))
+
+
+def _percentile(values: list[int], fraction: float) -> float:
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * fraction))] / 1e6
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+async def run(args: argparse.Namespace) -> dict[str, typing.Any]:
+    server = gateway.Gateway(args.endpoint, codecs.get_codec(args.codec), batch_size=args.batch_size)
+    received: collections.defaultdict[str, array.array[int]] = collections.defaultdict(lambda: array.array("q"))
+
+    def record(device: devices.DeviceView) -> None:
+        received[device.host_name].append(time.monotonic_ns())
+
+    for signal in enums.Signal:
+        await server.listen(signal, record)
+
+    server_task = asyncio.create_task(server.open())
+    await asyncio.sleep(0.2)
+
+    spawn = multiprocessing.get_context("spawn")
+    start = spawn.Event()
+    queue: multiprocessing.queues.Queue[dict[str, array.array[int]]] = spawn.Queue()
+    per_process, remainder = divmod(args.devices, args.processes)
+    workers = [
+        spawn.Process(
+            target=_worker,
+            args=(index, per_process + (index < remainder), args, start, queue),
+            daemon=True,
+        )
+        for index in range(args.processes)
+    ]
+    for worker in workers:
+        worker.start()
+
+    # Let the workers set up their devices before starting the clock.
+    await asyncio.sleep(args.warmup)
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    began = time.monotonic()
+    start.set()
+
+    loop = asyncio.get_running_loop()
+    sent: dict[str, array.array[int]] = {}
+    for _ in workers:
+        sent.update(await loop.run_in_executor(None, queue.get))
+
+    total_sent = sum(len(timestamps) for timestamps in sent.values())
+    deadline = time.monotonic() + args.drain_timeout
+    while sum(len(timestamps) for timestamps in received.values()) < total_sent and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+
+    elapsed = time.monotonic() - began
+    after = resource.getrusage(resource.RUSAGE_SELF)
+    rss = _rss_bytes()
+
+    server_task.cancel()
+    try:
+        await server_task
+    except asyncio.CancelledError:
+        pass
+    await server.close()
+    for worker in workers:
+        worker.join()
+
+    latencies = sorted(
+        dispatched - sent_at
+        for host_name, timestamps in sent.items()
+        for sent_at, dispatched in zip(timestamps, received.get(host_name, ()))
+    )
+    total_received = sum(len(timestamps) for timestamps in received.values())
+    cpu = (after.ru_utime - usage.ru_utime) + (after.ru_stime - usage.ru_stime)
+    loop_type = type(asyncio.get_running_loop())
+    return {
+        "config": {
+            "devices": args.devices,
+            "processes": args.processes,
+            "rate": args.rate,
+            "duration": args.duration,
+            "mix": args.mix,
+            "endpoint": args.endpoint,
+            "codec": args.codec,
+            "pool": args.pool,
+            "batch_size": args.batch_size,
+            "loop": args.loop,
+        },
+        "loop": f"{loop_type.__module__}.{loop_type.__qualname__}",
+        "sent": total_sent,
+        "received": total_received,
+        "elapsed_sec": elapsed,
+        "messages_per_sec": total_received / elapsed,
+        "latency_ms": {
+            "p50": _percentile(latencies, 0.50),
+            "p99": _percentile(latencies, 0.99),
+            "p999": _percentile(latencies, 0.999),
+            "max": latencies[-1] / 1e6 if latencies else 0.0,
+        },
+        "gateway_cpu_sec": cpu,
+        "gateway_cpu_percent": cpu / elapsed * 100,
+        "gateway_rss_bytes": rss,
+    }
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, default=100, help="Number of simulated devices.")
+    parser.add_argument("--processes", type=int, default=2, help="Number of device processes.")
+    parser.add_argument("--rate", type=float, default=10.0, help="Signals per second per device, 0 for unbounded.")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds to drive load for.")
+    parser.add_argument("--mix", default="HELLO=0.9,RESTART=0.05,DHCP_IP=0.05", help="Weighted signal mix.")
+    parser.add_argument("--endpoint", default="tcp://127.0.0.1:5599", help="A tcp://127.0.0.1 or ipc:// endpoint.")
+    parser.add_argument("--codec", default="binary", choices=("binary", "json"))
+    parser.add_argument("--pool", type=int, default=0, help="Share this many sockets per process, 0 to disable.")
+    parser.add_argument("--batch-size", type=int, default=256, help="Gateway batch size.")
+    parser.add_argument(
+        "--loop", default="auto", help=f"Comma separated event loops to compare, Each one of {utils.LOOPS}."
+    )
+    parser.add_argument("--warmup", type=float, default=2.0, help="Seconds to wait for workers to start.")
+    parser.add_argument("--drain-timeout", type=float, default=5.0, help="Seconds to wait for in-flight signals.")
+    parser.add_argument("--output", help="Write the JSON result to this file instead of stdout.")
+    return parser.parse_args(argv)
+
+
+def _difference(baseline: dict[str, typing.Any], other: dict[str, typing.Any]) -> dict[str, typing.Any]:
+    def ratio(new: float, old: float) -> float:
+        return new / old if old else 0.0
+
+    return {
+        "messages_per_sec_ratio": ratio(other["messages_per_sec"], baseline["messages_per_sec"]),
+        "gateway_cpu_sec_ratio": ratio(other["gateway_cpu_sec"], baseline["gateway_cpu_sec"]),
+        "latency_ms_delta": {
+            name: other["latency_ms"][name] - value for name, value in baseline["latency_ms"].items()
+        },
+    }
+
+
+def compare(args: argparse.Namespace) -> dict[str, typing.Any]:
+    """Run the benchmark once per event loop in `args.loop` and report each one against the first."""
+    loops = [name.strip() for name in args.loop.split(",")]
+    for name in loops:
+        # Fail before any run rather than after the first one.
+        utils.get_loop_factory(name)
+
+    runs = {}
+    for name in loops:
+        loop_args = argparse.Namespace(**{**vars(args), "loop": name})
+        runs[name] = utils.run(run(loop_args), loop_factory=name)
+
+    if len(runs) == 1:
+        return runs[loops[0]]
+
+    baseline = runs[loops[0]]
+    return {
+        "runs": runs,
+        "difference": {name: _difference(baseline, result) for name, result in runs.items() if name != loops[0]},
+    }
+
+
+def main() -> None:
+    args = parse_args()
+    result = json.dumps(compare(args), indent=2)
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(result)
+    else:
+        print(result)
+
+
+if __name__ == "__main__":
+    main()
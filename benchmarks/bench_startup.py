@@ -0,0 +1,129 @@
+# BSD 3-Clause License
+
+# Copyright (c) 2022-Present, nxtlo
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+
+# * Neither the name of the copyright holder nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""Cold import time benchmark.
+
+Imports a module in fresh interpreters with `-X importtime` and reports the median cumulative import time,
+The wall time of the whole interpreter, And the slowest imports, As JSON.
+
+Run from the repository root.
+
+```sh
+python -m benchmarks.bench_startup --module message_service.gateway --runs 20 --budget-ms 50
+```
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+import typing
+
+
+def _import_times(stderr: str) -> list[tuple[str, int, int]]:
+    """Parse `-X importtime` output into `(module, self_us, cumulative_us)` entries."""
+    entries: list[tuple[str, int, int]] = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        entries.append((name.strip(), int(self_us), int(cumulative_us)))
+    return entries
+
+
+def _run_once(module: str) -> tuple[float, list[tuple[str, int, int]]]:
+    started = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return time.perf_counter() - started, _import_times(process.stderr)
+
+
+def run(args: argparse.Namespace) -> dict[str, typing.Any]:
+    # The interpreter's own startup, Subtracted from the wall times below.
+    baseline = statistics.median(_run_once("sys")[0] for _ in range(args.runs))
+
+    walls: list[float] = []
+    imports: list[float] = []
+    entries: list[tuple[str, int, int]] = []
+    for _ in range(args.runs):
+        wall, entries = _run_once(args.module)
+        walls.append(wall)
+        # The module's own line comes last and includes every import it triggered.
+        imports.append(next(cumulative for name, _, cumulative in reversed(entries) if name == args.module) / 1e3)
+
+    median = statistics.median(imports)
+    slowest = sorted(entries, key=lambda entry: entry[1], reverse=True)[: args.top]
+    return {
+        "module": args.module,
+        "runs": args.runs,
+        "import_ms": {"median": median, "min": min(imports), "max": max(imports)},
+        "wall_ms_above_interpreter": (statistics.median(walls) - baseline) * 1e3,
+        "budget_ms": args.budget_ms,
+        "within_budget": median <= args.budget_ms,
+        "slowest_self_ms": {name: self_us / 1e3 for name, self_us, _ in slowest},
+        "faker_imported": any(name == "faker" for name, _, _ in entries),
+    }
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="message_service.gateway", help="The module to import.")
+    parser.add_argument("--runs", type=int, default=20, help="Number of fresh interpreters to import it in.")
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest imports to report.")
+    parser.add_argument("--budget-ms", type=float, default=50.0, help="The target median import time.")
+    parser.add_argument("--output", help="Write the JSON result to this file instead of stdout.")
+    return parser.parse_args(argv)
+
+
+def main() -> None:
+    args = parse_args()
+    result = run(args)
+    encoded = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(encoded)
+    else:
+        print(encoded)
+
+    if not result["within_budget"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
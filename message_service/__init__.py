@@ -0,0 +1,104 @@
+# BSD 3-Clause License
+
+# Copyright (c) 2022-Present, nxtlo
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+
+# * Neither the name of the copyright holder nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""A message service between devices and a gateway over ZeroMQ.
+
+Submodules are imported on first attribute access, So `import message_service` stays cheap
+And `message_service.gateway` only pulls in what the gateway needs.
+"""
+
+from __future__ import annotations
+
+
+__all__ = (
+    "backlog",
+    "bridge",
+    "coalesce",
+    "cluster",
+    "codecs",
+    "commands",
+    "config",
+    "devices",
+    "enums",
+    "events",
+    "gateway",
+    "identities",
+    "index",
+    "liveness",
+    "logs",
+    "metrics",
+    "persistence",
+    "pool",
+    "ratelimit",
+    "registry",
+    "sharding",
+    "traits",
+    "utils",
+)
+
+import importlib
+import typing
+
+if typing.TYPE_CHECKING:
+    from . import backlog
+    from . import bridge
+    from . import coalesce
+    from . import cluster
+    from . import codecs
+    from . import commands
+    from . import config
+    from . import devices
+    from . import enums
+    from . import events
+    from . import gateway
+    from . import identities
+    from . import index
+    from . import liveness
+    from . import logs
+    from . import metrics
+    from . import persistence
+    from . import pool
+    from . import ratelimit
+    from . import registry
+    from . import sharding
+    from . import traits
+    from . import utils
+
+
+def __getattr__(name: str) -> typing.Any:
+    if name in __all__:
+        # Importing a submodule also sets it as an attribute of this package, So this only runs once per name.
+        return importlib.import_module(f".{name}", __name__)
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> list[str]:
+    return sorted((*globals(), *__all__))
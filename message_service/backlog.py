@@ -0,0 +1,138 @@
+# BSD 3-Clause License
+
+# Copyright (c) 2022-Present, nxtlo
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+
+# * Neither the name of the copyright holder nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""A bounded backlog of signals for devices that can't reach the gateway."""
+
+from __future__ import annotations
+
+
+__all__ = ("SignalBacklog",)
+
+import array
+import collections
+import logging
+import os
+import typing
+
+from . import enums
+
+_LOGGER = logging.getLogger("backlog")
+
+_SIGNALS_BY_VALUE: typing.Final[dict[int, enums.Signal]] = {signal.value: signal for signal in enums.Signal}
+
+
+class SignalBacklog:
+    """A first in, first out queue of signals that spills to a file once its memory is full.
+
+    Signals are stored as single bytes, Both in memory and on disk. Once both the memory and the spill file are full,
+    New signals are dropped and counted in `dropped`. A spill file left over by a previous run is picked up again.
+
+    Parameters
+    ----------
+    maxsize : `int`
+        The maximum number of signals kept in memory.
+    spill_path : `str | os.PathLike[str] | None`
+        If provided, Signals that don't fit in memory are appended to this file.
+    max_spilled : `int`
+        The maximum number of signals kept in the spill file.
+    """
+
+    __slots__ = ("_maxsize", "_memory", "_spill_path", "_max_spilled", "_spilled", "dropped")
+
+    def __init__(
+        self,
+        maxsize: int = 10_000,
+        *,
+        spill_path: str | os.PathLike[str] | None = None,
+        max_spilled: int = 1_000_000,
+    ) -> None:
+        if maxsize < 1:
+            raise ValueError("maxsize must be greater than 0.")
+
+        self._maxsize = maxsize
+        self._memory: collections.deque[enums.Signal] = collections.deque()
+        self._spill_path = spill_path
+        self._max_spilled = max_spilled if spill_path is not None else 0
+        self._spilled = os.path.getsize(spill_path) if spill_path is not None and os.path.exists(spill_path) else 0
+        self.dropped = 0
+        """The number of signals dropped because the backlog was full."""
+
+    def __len__(self) -> int:
+        return len(self._memory) + self._spilled
+
+    def __bool__(self) -> bool:
+        return bool(self._memory) or self._spilled > 0
+
+    @property
+    def spilled(self) -> int:
+        """The number of signals currently in the spill file."""
+        return self._spilled
+
+    def push(self, signal: enums.Signal) -> bool:
+        """Add a signal to the end of the backlog, Returning `False` if it was dropped."""
+        # Once anything is spilled, Newer signals must follow it to the file to keep their order.
+        if not self._spilled and len(self._memory) < self._maxsize:
+            self._memory.append(signal)
+            return True
+
+        if self._spilled < self._max_spilled:
+            assert self._spill_path is not None
+            with open(self._spill_path, "ab") as file:
+                file.write(signal.to_bytes(1, "big", signed=True))
+            self._spilled += 1
+            return True
+
+        self.dropped += 1
+        if self.dropped == 1 or self.dropped % 1_000 == 0:
+            _LOGGER.warning("Signal backlog is full, %d signals dropped so far", self.dropped)
+        return False
+
+    def pop_many(self, limit: int) -> list[enums.Signal]:
+        """Remove and return up to `limit` signals from the start of the backlog."""
+        if not self._memory and self._spilled:
+            self._unspill()
+
+        memory = self._memory
+        return [memory.popleft() for _ in range(min(limit, len(memory)))]
+
+    def restore(self, signals: typing.Sequence[enums.Signal]) -> None:
+        """Put back signals returned by `pop_many` that couldn't be sent, In front of the rest."""
+        self._memory.extendleft(reversed(signals))
+
+    def _unspill(self) -> None:
+        assert self._spill_path is not None
+        with open(self._spill_path, "rb") as file:
+            data = file.read()
+        os.truncate(self._spill_path, 0)
+        self._spilled = 0
+
+        # The spill file is bounded, So loading it back at once is fine even past `maxsize`.
+        self._memory.extend(_SIGNALS_BY_VALUE[value] for value in array.array("b", data) if value in _SIGNALS_BY_VALUE)
@@ -0,0 +1,289 @@
+# BSD 3-Clause License
+
+# Copyright (c) 2022-Present, nxtlo
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+
+# * Neither the name of the copyright holder nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""A websocket bridge that pushes device state changes from a gateway to dashboard clients.
+
+Every event is serialized once and the same payload is queued for every client. Each client has a bounded queue
+holding at most one pending update per device, So a slow client only ever receives the latest state of each device.
+A client that falls further behind than its queue allows gets a fresh snapshot instead of the updates it missed.
+
+Messages are JSON text frames.
+
+* `{"type": "snapshot", "devices": [device, ...]}` is sent on connect and after a client fell behind.
+* `{"type": "device", ...device}` is sent for every dispatched signal.
+
+Where a device is `{"host_name", "ip_address", "mac_address", "signal", "registered"}`.
+
+Example
+-------
+```py
+server = gateway.Gateway()
+dashboard = bridge.Bridge(server)
+
+# Clients connect to ws://127.0.0.1:8080/ws
+runner = await dashboard.serve(port=8080)
+await server.open()
+```
+"""
+
+from __future__ import annotations
+
+
+__all__ = ("Bridge",)
+
+import asyncio
+import collections
+import json
+import logging
+import typing
+
+from . import enums
+
+if typing.TYPE_CHECKING:
+    from aiohttp import web
+
+    from . import devices, gateway
+
+_LOGGER = logging.getLogger("bridge")
+
+
+def _device(view: devices.DeviceView, registered: bool) -> dict[str, typing.Any]:
+    return {
+        "host_name": view.host_name,
+        "ip_address": view.ip_address,
+        "mac_address": view.mac_address,
+        "signal": view.signal.name,
+        "registered": registered,
+    }
+
+
+class _Client:
+    """A connected websocket and the updates waiting to be sent to it."""
+
+    __slots__ = ("_socket", "_max_pending", "_pending", "_stale", "_ready", "dropped")
+
+    def __init__(self, socket: web.WebSocketResponse, max_pending: int) -> None:
+        self._socket = socket
+        self._max_pending = max_pending
+        # Host name -> latest payload, Oldest first.
+        self._pending: collections.OrderedDict[str, bytes] = collections.OrderedDict()
+        # Whether updates were dropped and the client needs a snapshot.
+        self._stale = False
+        self._ready = asyncio.Event()
+        self.dropped = 0
+
+    def push(self, host_name: str, payload: bytes) -> None:
+        if self._stale:
+            # The next snapshot includes this update already.
+            return
+
+        pending = self._pending
+        if host_name in pending:
+            # Coalesce with the update that wasn't sent yet.
+            pending[host_name] = payload
+        elif len(pending) < self._max_pending:
+            pending[host_name] = payload
+        else:
+            self.dropped += len(pending) + 1
+            pending.clear()
+            self._stale = True
+
+        self._ready.set()
+
+    async def run(self, snapshot: typing.Callable[[], bytes]) -> None:
+        socket = self._socket
+        send: typing.Callable[[bytes], typing.Awaitable[None]]
+        if hasattr(socket, "send_frame"):
+            from aiohttp import web
+
+            # Sends the shared payload as is instead of encoding a copy of it per client.
+            async def send(payload: bytes) -> None:
+                await socket.send_frame(payload, web.WSMsgType.TEXT)
+
+        else:
+
+            async def send(payload: bytes) -> None:
+                await socket.send_str(payload.decode())
+
+        await send(snapshot())
+        while not socket.closed:
+            await self._ready.wait()
+            self._ready.clear()
+
+            if self._stale:
+                self._stale = False
+                await send(snapshot())
+                continue
+
+            while self._pending:
+                _, payload = self._pending.popitem(last=False)
+                await send(payload)
+                if self._stale:
+                    break
+
+
+class Bridge:
+    """Push a gateway's device state changes to websocket clients.
+
+    Parameters
+    ----------
+    server : `gateway.Gateway`
+        The gateway whose signals to forward.
+    max_pending : `int`
+        The maximum number of devices with a pending update per client,
+        A client falling further behind gets a snapshot instead.
+    signals : `Iterable[enums.Signal] | None`
+        The signals to forward, Defaults to every signal.
+    """
+
+    __slots__ = ("_server", "_max_pending", "_signals", "_clients", "_snapshot", "_runner", "_subscribed")
+
+    def __init__(
+        self,
+        server: gateway.Gateway,
+        *,
+        max_pending: int = 1024,
+        signals: typing.Iterable[enums.Signal] | None = None,
+    ) -> None:
+        if max_pending < 1:
+            raise ValueError("max_pending must be greater than 0.")
+
+        self._server = server
+        self._max_pending = max_pending
+        self._signals = tuple(enums.Signal if signals is None else signals)
+        self._clients: set[_Client] = set()
+        # The serialized snapshot, Reused until the next event.
+        self._snapshot: bytes | None = None
+        self._runner: web.AppRunner | None = None
+        self._subscribed = False
+
+    @property
+    def clients(self) -> int:
+        """The number of connected clients."""
+        return len(self._clients)
+
+    @property
+    def dropped(self) -> int:
+        """The number of updates dropped for the clients that are currently connected."""
+        return sum(client.dropped for client in self._clients)
+
+    async def attach(self) -> None:
+        """Start forwarding the gateway's signals. This is called by `serve`."""
+        if self._subscribed:
+            return
+
+        for signal in self._signals:
+            await self._server.listen(signal, self._on_signal)
+        self._subscribed = True
+
+    def detach(self) -> None:
+        """Stop forwarding the gateway's signals."""
+        if not self._subscribed:
+            return
+
+        for signal in self._signals:
+            self._server.remove_listener(signal, self._on_signal)
+        self._subscribed = False
+
+    def make_app(self, path: str = "/ws") -> web.Application:
+        """Create an `aiohttp` application serving the bridge at `path`, To mount it in an existing application."""
+        from aiohttp import web
+
+        app = web.Application()
+        app.router.add_get(path, self.handle)
+        return app
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8080, path: str = "/ws") -> web.AppRunner:
+        """Attach to the gateway and serve the bridge at `ws://{host}:{port}{path}`.
+
+        Call `close()` to stop serving.
+        """
+        from aiohttp import web
+
+        await self.attach()
+        runner = web.AppRunner(self.make_app(path))
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        self._runner = runner
+        return runner
+
+    async def close(self) -> None:
+        """Detach from the gateway and disconnect every client."""
+        self.detach()
+        if self._runner is not None:
+            # Closes the client websockets as well.
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def handle(self, request: web.Request) -> web.WebSocketResponse:
+        """Handle a websocket client connection."""
+        from aiohttp import web
+
+        # Compression would compress every payload again per client.
+        socket = web.WebSocketResponse(heartbeat=30, compress=False)
+        await socket.prepare(request)
+
+        client = _Client(socket, self._max_pending)
+        self._clients.add(client)
+        writer = asyncio.create_task(client.run(self._get_snapshot))
+        try:
+            # Clients aren't expected to send anything, This only waits for them to disconnect.
+            async for _ in socket:
+                pass
+        finally:
+            self._clients.discard(client)
+            writer.cancel()
+            try:
+                await writer
+            except asyncio.CancelledError:
+                pass
+            except Exception:
+                _LOGGER.debug("Websocket client %s disconnected while sending", request.remote, exc_info=True)
+
+        return socket
+
+    def _get_snapshot(self) -> bytes:
+        if self._snapshot is None:
+            self._snapshot = json.dumps(
+                {"type": "snapshot", "devices": [_device(view, True) for view in self._server.devices.values()]}
+            ).encode()
+        return self._snapshot
+
+    def _on_signal(self, view: devices.DeviceView) -> None:
+        self._snapshot = None
+        if not self._clients:
+            return
+
+        entry = _device(view, view.host_name in self._server.devices)
+        entry["type"] = "device"
+        payload = json.dumps(entry).encode()
+        for client in self._clients:
+            client.push(view.host_name, payload)
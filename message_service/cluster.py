@@ -0,0 +1,335 @@
+# BSD 3-Clause License
+
+# Copyright (c) 2022-Present, nxtlo
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+
+# * Neither the name of the copyright holder nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""A broker-less cluster of gateways replicating their registries to each other.
+
+Every node is a regular gateway devices can connect to, Which also binds a `PUB` socket and subscribes to
+the `PUB` sockets of its peers. Registry changes made by a node are published with a version made of a Lamport
+clock and the node's ID, And each node applies a change only if its version is newer than the one it holds
+for that device. Removals are kept as versioned tombstones, So a late registration can't bring a device back.
+Every node therefore converges on the same `devices` view whatever order the changes arrive in.
+
+PUB/SUB drops messages to peers that aren't connected yet or fall behind, So each node also publishes
+its whole state every `sync_interval` seconds, And as soon as it hears from a peer for the first time.
+Tombstones are forgotten after `tombstone_ttl` seconds, Which must be long enough for every peer to have seen them.
+
+Example
+-------
+```py
+node = cluster.ClusterGateway(
+    "ipc:///tmp/batteries-a",
+    publish_address="ipc:///tmp/batteries-a.pub",
+    peers=("ipc:///tmp/batteries-b.pub",),
+)
+device = devices.Device(endpoint=("ipc:///tmp/batteries-a", "ipc:///tmp/batteries-b"))
+```
+"""
+
+from __future__ import annotations
+
+
+__all__ = ("ClusterGateway", "Version")
+
+import asyncio
+import logging
+import os
+import struct
+import time
+import typing
+
+import zmq
+import zmq.asyncio
+
+from . import devices, enums, gateway
+
+if typing.TYPE_CHECKING:
+    import collections.abc as collections
+
+_LOGGER = logging.getLogger("cluster")
+
+Version = tuple[int, str]
+"""A Lamport clock value and the ID of the node that made the change, Compared in that order."""
+
+_PUT: typing.Final[bytes] = b"P"
+_REMOVE: typing.Final[bytes] = b"R"
+_BEAT: typing.Final[bytes] = b"B"
+_COUNTER = struct.Struct("!Q")
+_SIGNAL = struct.Struct("!b")
+_NO_VERSION: typing.Final[Version] = (0, "")
+# Messages published before yielding to the loop during a full sync.
+_SYNC_CHUNK: typing.Final[int] = 1_000
+
+
+class ClusterGateway(gateway.Gateway):
+    """A gateway node replicating its registry with its peers.
+
+    Parameters
+    ----------
+    address : `str | None`
+        The address devices push their signals to.
+    publish_address : `str`
+        The address to publish this node's registry changes on.
+    peers : `Iterable[str]`
+        The publish addresses of the other nodes.
+    node_id : `str | None`
+        This node's unique ID, A random one is generated if not provided.
+    sync_interval : `float`
+        The number of seconds between two publications of this node's whole state.
+    beat_interval : `float`
+        The number of seconds between two announcements of this node to its peers.
+    tombstone_ttl : `float`
+        The number of seconds a removed device's tombstone is kept and republished for,
+        Must be greater than `sync_interval`.
+    **kwargs : `typing.Any`
+        Passed to `gateway.Gateway`.
+    """
+
+    __slots__ = (
+        "_publish_address",
+        "_peers",
+        "_node_id",
+        "_sync_interval",
+        "_beat_interval",
+        "_clock",
+        "_versions",
+        "_tombstones",
+        "_tombstone_ttl",
+        "_known_nodes",
+        "_publisher",
+        "_subscriber",
+        "_tasks",
+    )
+
+    def __init__(
+        self,
+        address: str | None = None,
+        *,
+        publish_address: str,
+        peers: collections.Iterable[str] = (),
+        node_id: str | None = None,
+        sync_interval: float = 30.0,
+        beat_interval: float = 1.0,
+        tombstone_ttl: float = 600.0,
+        **kwargs: typing.Any,
+    ) -> None:
+        if tombstone_ttl <= sync_interval:
+            raise ValueError("tombstone_ttl must be greater than sync_interval.")
+
+        super().__init__(address, **kwargs)
+        self._publish_address = publish_address
+        self._peers = tuple(peers)
+        self._node_id = node_id or os.urandom(6).hex()
+        self._sync_interval = sync_interval
+        self._beat_interval = beat_interval
+        self._clock = 0
+        # Host name -> the version of the latest change applied, Including removals.
+        self._versions: dict[str, Version] = {}
+        # Host name -> when it was removed, In removal order.
+        self._tombstones: dict[str, float] = {}
+        self._tombstone_ttl = tombstone_ttl
+        self._known_nodes: set[str] = set()
+        # Replication is published without blocking from the receive loop, So this is a plain socket.
+        self._publisher: zmq.Socket[bytes] | None = None
+        self._subscriber: zmq.asyncio.Socket | None = None
+        self._tasks: list[asyncio.Task[None]] = []
+
+    @property
+    def node_id(self) -> str:
+        """This node's unique ID."""
+        return self._node_id
+
+    @property
+    def peers(self) -> collections.Sequence[str]:
+        """The publish addresses of the other nodes."""
+        return self._peers
+
+    def version_of(self, host_name: str) -> Version | None:
+        """Return the version of the latest change applied to a device, If any."""
+        return self._versions.get(host_name)
+
+    async def open(self) -> None:
+        self._publisher = zmq.Socket(self._context, zmq.PUB)
+        self._socket_config.apply(self._publisher)
+        # A full sync publishes the whole registry at once, Which must not be cut short by the high-water mark.
+        self._publisher.setsockopt(zmq.SNDHWM, 0)
+        self._publisher.bind(self._publish_address)
+
+        self._subscriber = self._context.socket(zmq.SUB)
+        self._socket_config.apply(self._subscriber)
+        self._subscriber.setsockopt(zmq.RCVHWM, 0)
+        self._subscriber.setsockopt(zmq.SUBSCRIBE, b"")
+        for peer in self._peers:
+            self._subscriber.connect(peer)
+
+        self._tasks = [
+            asyncio.create_task(self._replicate(self._subscriber)),
+            asyncio.create_task(self._announce()),
+        ]
+        _LOGGER.info("Cluster node %s publishing on %s", self._node_id, self._publish_address)
+        await super().open()
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        self._tasks.clear()
+
+        for socket in (self._publisher, self._subscriber):
+            if socket is not None:
+                socket.close()
+        self._publisher = self._subscriber = None
+        await super().close()
+
+    def _apply(self, dev: devices.DeviceView, signal: enums.Signal | None = None) -> None:
+        known = self._devices.get(dev.host_name)
+        super()._apply(dev, signal)
+        current = self._devices.get(dev.host_name)
+        if current is known and (
+            # A device that failed over from another node is claimed by this one, Even if nothing changed,
+            # So the node it left stops tracking its liveness and doesn't evict it cluster-wide.
+            current is None or self._versions.get(dev.host_name, _NO_VERSION)[1] == self._node_id
+        ):
+            return
+
+        self._clock += 1
+        version = (self._clock, self._node_id)
+        self._versions[dev.host_name] = version
+        self._bury(dev.host_name, removed=current is None)
+        self._publish(dev.host_name, current, version)
+
+    def _publish(self, host_name: str, view: devices.DeviceView | None, version: Version) -> None:
+        if self._publisher is None:
+            return
+
+        counter, node_id = version
+        header = [_PUT if view is not None else _REMOVE, _COUNTER.pack(counter), node_id.encode(), host_name.encode()]
+        if view is not None:
+            header += [view.ip_address.encode(), view.mac_address.encode(), _SIGNAL.pack(view.signal)]
+
+        self._send(header)
+
+    def _send(self, frames: list[bytes]) -> None:
+        if self._publisher is None:
+            return
+
+        # PUB sockets drop instead of blocking, And the periodic full sync repairs whatever a peer missed.
+        try:
+            self._publisher.send_multipart(frames, zmq.NOBLOCK)
+        except zmq.ZMQError as exc:
+            _LOGGER.warning("Dropping a replication message that couldn't be published: %s", exc)
+
+    def _merge(self, frames: list[bytes]) -> None:
+        kind, counter_frame, node_frame, host_frame, *rest = frames
+        if kind != _PUT and kind != _REMOVE:
+            _LOGGER.warning("Dropping a replication message of unknown kind %r", kind)
+            return
+
+        counter = _COUNTER.unpack(counter_frame)[0]
+        version = (counter, node_frame.decode())
+        host_name = host_frame.decode()
+
+        # Lamport clock, Later local changes must win over anything seen so far.
+        if counter > self._clock:
+            self._clock = counter
+        if version <= self._versions.get(host_name, _NO_VERSION):
+            return
+
+        self._versions[host_name] = version
+        self._bury(host_name, removed=kind == _REMOVE)
+        # The device is owned by whichever node it talks to now, This node mustn't evict it for going quiet.
+        if self._liveness is not None:
+            self._liveness.cancel(host_name)
+
+        if kind == _PUT:
+            ip_address, mac_address, signal = rest
+            known = self._devices.get(host_name)
+            new_signal = enums.Signal(_SIGNAL.unpack(signal)[0])
+            if (
+                known is None
+                or known.ip_address != ip_address.decode()
+                or known.mac_address != mac_address.decode()
+                or known.signal is not new_signal
+            ):
+                self._devices.put(
+                    devices.DeviceView(host_name, ip_address.decode(), mac_address.decode(), new_signal)
+                )
+        else:
+            self._devices.remove(host_name)
+
+    def _bury(self, host_name: str, *, removed: bool) -> None:
+        # Popped first so a device removed again moves to the end, Keeping the tombstones in removal order.
+        self._tombstones.pop(host_name, None)
+        if removed:
+            self._tombstones[host_name] = time.monotonic()
+
+    def _expire_tombstones(self) -> None:
+        horizon = time.monotonic() - self._tombstone_ttl
+        while self._tombstones:
+            host_name, removed_at = next(iter(self._tombstones.items()))
+            if removed_at > horizon:
+                break
+
+            del self._tombstones[host_name]
+            del self._versions[host_name]
+
+    async def _replicate(self, subscriber: zmq.asyncio.Socket) -> None:
+        while True:
+            frames = await subscriber.recv_multipart()
+            try:
+                if frames[0] == _BEAT:
+                    node_id = frames[1].decode()
+                    if node_id not in self._known_nodes:
+                        self._known_nodes.add(node_id)
+                        _LOGGER.info("Cluster node %s joined, Syncing with it", node_id)
+                        await self._sync()
+                    continue
+
+                self._merge(frames)
+            except (ValueError, struct.error, UnicodeDecodeError):
+                _LOGGER.warning("Dropping a malformed replication message of %d frames", len(frames))
+
+    async def _announce(self) -> None:
+        next_sync = self._sync_interval
+        while True:
+            await asyncio.sleep(self._beat_interval)
+            self._send([_BEAT, self._node_id.encode()])
+
+            next_sync -= self._beat_interval
+            if next_sync <= 0:
+                next_sync = self._sync_interval
+                self._expire_tombstones()
+                await self._sync()
+
+    async def _sync(self) -> None:
+        """Publish the latest version of every device this node knows about."""
+        for index, (host_name, version) in enumerate(tuple(self._versions.items()), 1):
+            self._publish(host_name, self._devices.get(host_name), version)
+            if index % _SYNC_CHUNK == 0:
+                await asyncio.sleep(0)
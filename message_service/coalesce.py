@@ -0,0 +1,205 @@
+# BSD 3-Clause License
+
+# Copyright (c) 2022-Present, nxtlo
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+
+# * Neither the name of the copyright holder nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""Coalescing of device state changes into periodic deltas.
+
+A `Coalescer` keeps only the latest view of each device that changed within a window, Then emits them all at once.
+A device flapping between signals many times inside a window produces a single entry, And a device that ended the
+window in the state it was last emitted in produces none, So consumers see at most one delta per window
+no matter how noisy the devices are.
+
+Example
+-------
+```py
+def on_delta(delta: Mapping[str, devices.DeviceView]) -> None:
+    for host_name, view in delta.items():
+        ...
+
+states = coalesce.Coalescer(window=0.25)
+states.subscribe(on_delta)
+await states.attach(server)
+```
+"""
+
+from __future__ import annotations
+
+
+__all__ = ("Coalescer", "DeltaCallback")
+
+import asyncio
+import inspect
+import logging
+import types
+import typing
+
+from . import enums
+
+if typing.TYPE_CHECKING:
+    import collections.abc as collections
+
+    from . import devices, gateway
+
+DeltaCallback = typing.Callable[[typing.Mapping[str, "devices.DeviceView"]], typing.Any]
+"""A delta callback, Either a regular function or a coroutine function taking the changed views by host name."""
+
+_LOGGER = logging.getLogger("coalesce")
+
+
+class Coalescer:
+    """Collect device views and emit the ones that changed once per window.
+
+    Parameters
+    ----------
+    window : `float`
+        The number of seconds to collect changes for before emitting them.
+        The window starts with the first change after a flush.
+    signals : `Iterable[enums.Signal] | None`
+        The signals to collect when attached to a gateway, Defaults to every signal.
+    """
+
+    __slots__ = ("_window", "_signals", "_pending", "_emitted", "_callbacks", "_timer", "_server", "_tasks")
+
+    def __init__(self, window: float = 0.1, *, signals: collections.Iterable[enums.Signal] | None = None) -> None:
+        if window <= 0:
+            raise ValueError("window must be greater than 0.")
+
+        self._window = window
+        self._signals = tuple(enums.Signal if signals is None else signals)
+        self._pending: dict[str, devices.DeviceView] = {}
+        # The last view emitted for each device, Devices are forgotten once they're emitted closed.
+        self._emitted: dict[str, devices.DeviceView] = {}
+        self._callbacks: list[tuple[DeltaCallback, bool]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._server: gateway.Gateway | None = None
+        self._tasks: set[asyncio.Task[typing.Any]] = set()
+
+    @property
+    def window(self) -> float:
+        """The number of seconds changes are collected for."""
+        return self._window
+
+    @property
+    def pending(self) -> int:
+        """The number of devices with a change that wasn't emitted yet."""
+        return len(self._pending)
+
+    def subscribe(self, callback: DeltaCallback) -> None:
+        """Register a callback to be called with every delta."""
+        self._callbacks.append((callback, inspect.iscoroutinefunction(callback)))
+
+    def unsubscribe(self, callback: DeltaCallback) -> None:
+        """Remove a previously registered callback.
+
+        Raises
+        ------
+        `LookupError`
+            If the callback isn't registered.
+        """
+        for index, (registered, _) in enumerate(self._callbacks):
+            if registered == callback:
+                del self._callbacks[index]
+                return
+
+        raise LookupError(f"{callback!r} is not subscribed")
+
+    async def attach(self, server: gateway.Gateway) -> None:
+        """Collect the signals dispatched by a gateway."""
+        if self._server is not None:
+            raise RuntimeError("Coalescer is already attached.")
+
+        for signal in self._signals:
+            await server.listen(signal, self.push)
+        self._server = server
+
+    def detach(self) -> None:
+        """Stop collecting the gateway's signals and emit what's pending."""
+        if self._server is None:
+            return
+
+        for signal in self._signals:
+            self._server.remove_listener(signal, self.push)
+        self._server = None
+        self.flush()
+
+    def push(self, view: devices.DeviceView) -> None:
+        """Record the latest view of a device."""
+        self._pending[view.host_name] = view
+        if self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self._window, self.flush)
+
+    def flush(self) -> typing.Mapping[str, devices.DeviceView]:
+        """Emit the pending changes now and return them.
+
+        Returns
+        -------
+        `Mapping[str, devices.DeviceView]`
+            The latest view of each device that changed since the last flush.
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        pending, self._pending = self._pending, {}
+        emitted = self._emitted
+        delta: dict[str, devices.DeviceView] = {}
+        for host_name, view in pending.items():
+            if emitted.get(host_name) == view:
+                # Flapped back to where it was.
+                continue
+
+            delta[host_name] = view
+            if view.signal is enums.Signal.CLOSE:
+                emitted.pop(host_name, None)
+            else:
+                emitted[host_name] = view
+
+        if not delta:
+            return delta
+
+        result = types.MappingProxyType(delta)
+        for callback, is_async in self._callbacks:
+            if is_async:
+                task = asyncio.get_running_loop().create_task(callback(result))
+                self._tasks.add(task)
+                task.add_done_callback(self._on_done)
+                continue
+
+            try:
+                callback(result)
+            except Exception:
+                _LOGGER.exception("Delta callback %r failed", callback)
+
+        return result
+
+    def _on_done(self, task: asyncio.Task[typing.Any]) -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and (exc := task.exception()) is not None:
+            _LOGGER.error("Delta callback task %r failed", task, exc_info=exc)
@@ -0,0 +1,202 @@
+# BSD 3-Clause License
+
+# Copyright (c) 2022-Present, nxtlo
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+
+# * Neither the name of the copyright holder nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Wire codecs used to encode devices before sending their signals to the gateway.
+
+A message is a multipart message made of the device's identity frame followed by one frame per signal.
+The identity never changes, So devices encode it once and reuse it for every message,
+Only the single byte signal frames are appended.
+
+```
+[identity, signal, signal, ...]
+```
+
+Signal frames are always a single int8. The identity frame is encoded by one of these codecs:
+
+* `BinaryCodec` - The default codec. A fixed-layout, `struct` packed identity.
+* `JSONCodec` - The legacy JSON codec, Kept as a fallback for debugging or for peers that
+can't speak the binary format.
+
+Binary identity layout
+----------------------
+```
++------------+-------------+-----------+-----------------+
+| ip_address | mac_address | name_size | host_name       |
+| 4 bytes    | 6 bytes     | uint8     | name_size bytes |
++------------+-------------+-----------+-----------------+
+```
+"""
+
+from __future__ import annotations
+
+
+__all__ = (
+    "BinaryCodec",
+    "JSONCodec",
+    "Identity",
+    "BINARY",
+    "JSON",
+    "get_codec",
+    "encode_signal",
+    "decode_signal",
+)
+
+import json
+import socket
+import struct
+import typing
+
+from . import enums
+
+if typing.TYPE_CHECKING:
+    from . import traits
+
+    Buffer = bytes | bytearray | memoryview
+
+_HEADER = struct.Struct("!4s6sB")
+_SIGNAL = struct.Struct("!b")
+_MAX_HOST_NAME_SIZE = 255
+
+_SIGNALS: typing.Final[dict[enums.Signal, bytes]] = {signal: _SIGNAL.pack(signal) for signal in enums.Signal}
+# Indexed by the unsigned value of the signal byte, So decoding a frame allocates nothing.
+_SIGNALS_BY_BYTE: typing.Final[dict[int, enums.Signal]] = {signal.value & 0xFF: signal for signal in enums.Signal}
+
+
+class Identity(typing.NamedTuple):
+    """A decoded device identity."""
+
+    host_name: str
+    ip_address: str
+    mac_address: str
+
+
+def encode_signal(signal: enums.Signal) -> bytes:
+    """Encode a signal into its single byte frame. The returned bytes are shared and never reallocated."""
+    return _SIGNALS[signal]
+
+
+def decode_signal(buffer: Buffer) -> enums.Signal:
+    """Decode a single byte signal frame."""
+    return _SIGNALS_BY_BYTE[buffer[0]]
+
+
+def _pack_mac(mac_address: str) -> bytes:
+    packed = bytes.fromhex(mac_address.replace(":", "").replace("-", ""))
+    if len(packed) != 6:
+        raise ValueError(f"Invalid MAC address {mac_address!r}")
+    return packed
+
+
+class BinaryCodec:
+    """A compact, fixed-layout binary codec. This is the default codec."""
+
+    __slots__ = ()
+
+    name: typing.Final[str] = "binary"
+
+    def encode_identity(self, device: traits.Push) -> bytes:
+        host_name = device.host_name.encode("UTF-8")
+        if len(host_name) > _MAX_HOST_NAME_SIZE:
+            raise ValueError(f"Host name {device.host_name!r} exceeds {_MAX_HOST_NAME_SIZE} bytes.")
+
+        return (
+            _HEADER.pack(
+                socket.inet_pton(socket.AF_INET, device.ipv4_address),
+                _pack_mac(device.mac_address),
+                len(host_name),
+            )
+            + host_name
+        )
+
+    def decode_identity(self, buffer: Buffer) -> Identity:
+        ip_address, mac_address, size = _HEADER.unpack_from(buffer)
+        offset = _HEADER.size
+        return Identity(
+            # Decoded straight from the slice, Without copying a memoryview into bytes first.
+            str(buffer[offset : offset + size], "UTF-8"),
+            socket.inet_ntop(socket.AF_INET, ip_address),
+            mac_address.hex(":"),
+        )
+
+    def route_key(self, buffer: Buffer) -> bytes:
+        offset = _HEADER.size
+        return bytes(buffer[offset : offset + buffer[offset - 1]])
+
+
+class JSONCodec:
+    """The JSON codec. Larger and slower than `BinaryCodec` but human readable."""
+
+    __slots__ = ()
+
+    name: typing.Final[str] = "json"
+
+    def encode_identity(self, device: traits.Push) -> bytes:
+        return json.dumps(
+            {
+                "ip_address": device.ipv4_address,
+                "mac_address": device.mac_address,
+                "host_name": device.host_name,
+            }
+        ).encode("UTF-8")
+
+    def decode_identity(self, buffer: Buffer) -> Identity:
+        device: dict[str, typing.Any] = json.loads(str(buffer, "UTF-8"))
+        return Identity(device["host_name"], device["ip_address"], device["mac_address"])
+
+    def route_key(self, buffer: Buffer) -> bytes:
+        return self.decode_identity(buffer).host_name.encode("UTF-8")
+
+
+BINARY: typing.Final[BinaryCodec] = BinaryCodec()
+"""The default binary codec instance."""
+
+JSON: typing.Final[JSONCodec] = JSONCodec()
+"""The JSON codec instance."""
+
+_CODECS: dict[str, traits.Codec] = {BINARY.name: BINARY, JSON.name: JSON}
+
+
+def get_codec(name: str) -> traits.Codec:
+    """Get a codec by its name.
+
+    Parameters
+    ----------
+    name : `str`
+        The codec name, Either `binary` or `json`.
+
+    Raises
+    ------
+    `LookupError`
+        If the codec name is unknown.
+    """
+    try:
+        return _CODECS[name]
+    except KeyError:
+        raise LookupError(f"Unknown codec {name!r}, Expected one of {tuple(_CODECS)}") from None
@@ -0,0 +1,379 @@
+# BSD 3-Clause License
+
+# Copyright (c) 2022-Present, nxtlo
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+
+# * Neither the name of the copyright holder nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""A request/reply command channel from the gateway to its devices.
+
+The gateway binds a `ROUTER` socket and each device connects a `DEALER` socket whose routing identity is its
+host name, So commands are addressed to devices by host name. Requests carry a correlation ID and any number of them
+can be in flight at once, Replies complete the matching future in whatever order they arrive.
+
+Frames are `[correlation_id, command]` for requests and `[correlation_id, status, payload]` for replies,
+Where the correlation ID is an unsigned 64-bit integer, The command is a signal frame and the status is `0` on success.
+
+Example
+-------
+```py
+server = gateway.Gateway(command_address="tcp://127.0.0.1:5556")
+device = devices.Device(command_endpoint="tcp://127.0.0.1:5556")
+
+# One wave of requests, Waiting for every reply at most 5 seconds.
+result = await server.command_many(server.devices, enums.Signal.RESTART, timeout=5)
+```
+"""
+
+from __future__ import annotations
+
+
+__all__ = (
+    "CommandChannel",
+    "CommandError",
+    "CommandHandler",
+    "CommandResult",
+    "Reply",
+    "serve_commands",
+    "COMMANDS",
+)
+
+import asyncio
+import dataclasses
+import inspect
+import itertools
+import logging
+import struct
+import typing
+
+import zmq
+import zmq.asyncio
+
+from . import codecs, config, enums
+
+if typing.TYPE_CHECKING:
+    import collections.abc as collections
+
+CommandHandler = typing.Callable[[enums.Signal], typing.Any]
+"""A device side command handler, Either a regular function or a coroutine function.
+
+It's called with the command and may return `bytes` to send back as the reply payload.
+Raising an exception replies with an error carrying its message.
+"""
+
+COMMANDS: typing.Final[frozenset[enums.Signal]] = frozenset(
+    (enums.Signal.RESTART, enums.Signal.DHCP_IP, enums.Signal.RECONNECT_NETWORK_INTERFACE)
+)
+"""The signals the gateway can send to devices as commands."""
+
+_LOGGER = logging.getLogger("commands")
+
+_CORRELATION = struct.Struct("!Q")
+_OK: typing.Final[bytes] = b"\x00"
+_ERROR: typing.Final[bytes] = b"\x01"
+
+
+def _check_command(command: enums.Signal) -> None:
+    if command not in COMMANDS:
+        raise ValueError(f"{command.name} isn't a command, Expected one of {sorted(c.name for c in COMMANDS)}")
+
+
+class CommandError(Exception):
+    """Raised when a device replied to a command with an error."""
+
+    def __init__(self, host_name: str, command: enums.Signal, message: str) -> None:
+        super().__init__(f"Device {host_name} failed to handle {command.name}: {message}")
+        self.host_name = host_name
+        self.command = command
+
+
+@dataclasses.dataclass(slots=True, frozen=True)
+class Reply:
+    """A successful reply to a command."""
+
+    host_name: str
+    command: enums.Signal
+    payload: bytes
+
+
+@dataclasses.dataclass(slots=True, frozen=True)
+class CommandResult:
+    """The aggregated result of a command sent to many devices."""
+
+    replies: typing.Mapping[str, Reply]
+    """The replies by host name of the devices that handled the command."""
+
+    failed: typing.Mapping[str, BaseException]
+    """The error by host name of every device that failed, Timed out or couldn't be reached."""
+
+    @property
+    def ok(self) -> bool:
+        """Whether every device handled the command."""
+        return not self.failed
+
+
+class CommandChannel:
+    """The gateway side of the command channel.
+
+    Parameters
+    ----------
+    address : `str`
+        The address to bind the `ROUTER` socket to.
+    socket_config : `config.SocketConfig | None`
+        Socket options, Defaults to `config.DEFAULT`.
+    context : `zmq.asyncio.Context | None`
+        The context to create the socket from, Defaults to a new context made from `socket_config`.
+    timeout : `float`
+        The default number of seconds to wait for a reply.
+    """
+
+    __slots__ = ("_address", "_socket_config", "_context", "_socket", "_timeout", "_pending", "_ids", "_receiver")
+
+    def __init__(
+        self,
+        address: str,
+        *,
+        socket_config: config.SocketConfig | None = None,
+        context: zmq.asyncio.Context | None = None,
+        timeout: float = 5.0,
+    ) -> None:
+        self._address = address
+        self._socket_config = socket_config or config.DEFAULT
+        self._context = context or self._socket_config.make_context()
+        self._socket: zmq.asyncio.Socket | None = None
+        self._timeout = timeout
+        # Correlation ID -> (host name, command, future) of every request in flight.
+        self._pending: dict[int, tuple[str, enums.Signal, asyncio.Future[Reply]]] = {}
+        self._ids = itertools.count(1)
+        self._receiver: asyncio.Task[None] | None = None
+
+    @property
+    def address(self) -> str:
+        return self._address
+
+    @property
+    def in_flight(self) -> int:
+        """The number of requests waiting for a reply."""
+        return len(self._pending)
+
+    async def open(self) -> None:
+        if self._socket is not None:
+            raise RuntimeError("Command channel is already open.")
+
+        socket = self._context.socket(zmq.ROUTER)
+        self._socket_config.apply(socket)
+        # Fail sends to devices that aren't connected instead of silently dropping them.
+        socket.setsockopt(zmq.ROUTER_MANDATORY, 1)
+        socket.bind(self._address)
+        self._socket = socket
+        self._receiver = asyncio.create_task(self._receive(socket))
+
+    async def close(self) -> None:
+        if self._socket is None:
+            raise RuntimeError("Command channel is already closed.")
+
+        if self._receiver is not None:
+            self._receiver.cancel()
+            self._receiver = None
+
+        self._socket.close()
+        self._socket = None
+        for _, _, future in self._pending.values():
+            future.cancel()
+        self._pending.clear()
+
+    async def request(self, host_name: str, command: enums.Signal, timeout: float | None = None) -> Reply:
+        """Send a command to a device and wait for its reply.
+
+        Parameters
+        ----------
+        host_name : `str`
+            The host name of the device.
+        command : `enums.Signal`
+            The command to send.
+        timeout : `float | None`
+            Seconds to wait for the reply, Defaults to the channel's timeout.
+
+        Raises
+        ------
+        `ValueError`
+            If the signal isn't one of `COMMANDS`.
+        `LookupError`
+            If the device isn't connected to the command channel.
+        `CommandError`
+            If the device replied with an error.
+        `asyncio.TimeoutError`
+            If the device didn't reply in time.
+        """
+        _check_command(command)
+        correlation_id, future = await self._send(host_name, command)
+        try:
+            return await asyncio.wait_for(future, self._timeout if timeout is None else timeout)
+        finally:
+            self._pending.pop(correlation_id, None)
+
+    async def request_many(
+        self,
+        host_names: collections.Iterable[str],
+        command: enums.Signal,
+        timeout: float | None = None,
+    ) -> CommandResult:
+        """Send a command to many devices at once and wait for their replies.
+
+        Every request is sent before waiting for any reply, So the whole fleet is handled in a single round trip
+        bounded by `timeout`.
+
+        Parameters
+        ----------
+        host_names : `Iterable[str]`
+            The host names of the devices.
+        command : `enums.Signal`
+            The command to send.
+        timeout : `float | None`
+            Seconds to wait for all the replies, Defaults to the channel's timeout.
+
+        Raises
+        ------
+        `ValueError`
+            If the signal isn't one of `COMMANDS`.
+        """
+        _check_command(command)
+        failed: dict[str, BaseException] = {}
+        in_flight: dict[asyncio.Future[Reply], tuple[int, str]] = {}
+        for host_name in host_names:
+            try:
+                correlation_id, future = await self._send(host_name, command)
+            except (LookupError, zmq.ZMQError) as exc:
+                failed[host_name] = exc
+            else:
+                in_flight[future] = (correlation_id, host_name)
+
+        if in_flight:
+            await asyncio.wait(in_flight, timeout=self._timeout if timeout is None else timeout)
+
+        replies: dict[str, Reply] = {}
+        for future, (correlation_id, host_name) in in_flight.items():
+            self._pending.pop(correlation_id, None)
+            if not future.done():
+                future.cancel()
+                failed[host_name] = asyncio.TimeoutError(f"Device {host_name} didn't reply to {command.name}")
+            elif (error := future.exception()) is not None:
+                failed[host_name] = error
+            else:
+                replies[host_name] = future.result()
+
+        return CommandResult(replies, failed)
+
+    async def _send(self, host_name: str, command: enums.Signal) -> tuple[int, asyncio.Future[Reply]]:
+        if self._socket is None:
+            raise RuntimeError("Command channel is not open.")
+
+        correlation_id = next(self._ids)
+        # Requests are tiny, So they're queued without waiting even when thousands are sent at once.
+        # Non-blocking sends complete or fail right away, So awaiting them won't yield to the loop.
+        try:
+            await self._socket.send_multipart(
+                (host_name.encode("UTF-8"), _CORRELATION.pack(correlation_id), codecs.encode_signal(command)),
+                zmq.NOBLOCK,
+            )
+        except zmq.ZMQError as exc:
+            if exc.errno == zmq.EHOSTUNREACH:
+                raise LookupError(f"Device {host_name} isn't connected to the command channel") from None
+            raise
+
+        future: asyncio.Future[Reply] = asyncio.get_running_loop().create_future()
+        self._pending[correlation_id] = (host_name, command, future)
+        return correlation_id, future
+
+    async def _receive(self, socket: zmq.asyncio.Socket) -> None:
+        while True:
+            frames = await socket.recv_multipart()
+            if len(frames) != 4:
+                _LOGGER.warning("Dropping a malformed reply of %d frames", len(frames))
+                continue
+
+            _, correlation, status, payload = frames
+            try:
+                (correlation_id,) = _CORRELATION.unpack(correlation)
+            except struct.error:
+                _LOGGER.warning("Dropping a reply with a malformed correlation id of %d bytes", len(correlation))
+                continue
+
+            entry = self._pending.pop(correlation_id, None)
+            if entry is None:
+                # Timed out already.
+                continue
+
+            host_name, command, future = entry
+            if future.done():
+                continue
+
+            if status == _OK:
+                future.set_result(Reply(host_name, command, payload))
+            else:
+                future.set_exception(CommandError(host_name, command, payload.decode("UTF-8", "replace")))
+
+
+async def serve_commands(socket: zmq.asyncio.Socket, handler: CommandHandler | None = None) -> None:
+    """Handle commands received on a device's `DEALER` socket until cancelled.
+
+    Parameters
+    ----------
+    socket : `zmq.asyncio.Socket`
+        The connected `DEALER` socket.
+    handler : `CommandHandler | None`
+        The command handler, If not provided, Commands are logged and acknowledged with an empty payload.
+    """
+    is_async = inspect.iscoroutinefunction(handler)
+    while True:
+        frames = await socket.recv_multipart()
+        if len(frames) != 2:
+            _LOGGER.warning("Dropping a malformed command of %d frames", len(frames))
+            continue
+
+        correlation, command = frames
+        try:
+            signal = codecs.decode_signal(command)
+        except (KeyError, IndexError):
+            _LOGGER.warning("Dropping an unknown command %r", command)
+            continue
+
+        try:
+            if handler is None:
+                _LOGGER.info("Received command %s", signal.name)
+                result = None
+            elif is_async:
+                result = await handler(signal)
+            else:
+                result = handler(signal)
+        except Exception as exc:
+            _LOGGER.exception("Command handler failed while handling %s", signal.name)
+            reply = (correlation, _ERROR, str(exc).encode("UTF-8"))
+        else:
+            reply = (correlation, _OK, result or b"")
+
+        await socket.send_multipart(reply)
@@ -0,0 +1,154 @@
+# BSD 3-Clause License
+
+# Copyright (c) 2022-Present, nxtlo
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+
+# * Neither the name of the copyright holder nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Socket tuning options shared by the gateway and devices."""
+
+from __future__ import annotations
+
+
+__all__ = ("SocketConfig", "ReconnectPolicy", "DEFAULT")
+
+import dataclasses
+import random
+import typing
+
+import zmq
+import zmq.asyncio
+
+
+@dataclasses.dataclass(slots=True, frozen=True)
+class SocketConfig:
+    """ZeroMQ socket and context options.
+
+    Options set to `None` are left to ZeroMQ's defaults.
+    The defaults favour throughput, Allowing bursts of signals to queue up
+    instead of blocking every device as soon as the gateway falls behind.
+    """
+
+    send_hwm: int | None = 10_000
+    """The high-water mark for outbound messages. `0` means no limit."""
+
+    recv_hwm: int | None = 100_000
+    """The high-water mark for inbound messages. `0` means no limit."""
+
+    send_buffer: int | None = None
+    """The kernel transmit buffer size in bytes."""
+
+    recv_buffer: int | None = None
+    """The kernel receive buffer size in bytes."""
+
+    tcp_keepalive: bool | None = True
+    """Whether to enable TCP keepalive probes."""
+
+    tcp_keepalive_idle: int | None = 60
+    """Seconds of idleness before the first keepalive probe is sent."""
+
+    tcp_keepalive_interval: int | None = 10
+    """Seconds between keepalive probes."""
+
+    tcp_keepalive_count: int | None = 3
+    """The number of unanswered probes before the connection is dropped."""
+
+    linger: int | None = 1_000
+    """Milliseconds to keep unsent messages around after the socket is closed. `-1` waits forever."""
+
+    io_threads: int = 1
+    """The number of IO threads for the `zmq.asyncio.Context`."""
+
+    def make_context(self) -> zmq.asyncio.Context:
+        """Create a new asyncio context using this config."""
+        return zmq.asyncio.Context(io_threads=self.io_threads)
+
+    def apply(self, socket: zmq.Socket[typing.Any]) -> None:
+        """Apply this config to a socket. This must be called before the socket binds or connects."""
+        options: tuple[tuple[int, int | None], ...] = (
+            (zmq.SNDHWM, self.send_hwm),
+            (zmq.RCVHWM, self.recv_hwm),
+            (zmq.SNDBUF, self.send_buffer),
+            (zmq.RCVBUF, self.recv_buffer),
+            (zmq.TCP_KEEPALIVE, None if self.tcp_keepalive is None else int(self.tcp_keepalive)),
+            (zmq.TCP_KEEPALIVE_IDLE, self.tcp_keepalive_idle),
+            (zmq.TCP_KEEPALIVE_INTVL, self.tcp_keepalive_interval),
+            (zmq.TCP_KEEPALIVE_CNT, self.tcp_keepalive_count),
+            (zmq.LINGER, self.linger),
+        )
+        for option, value in options:
+            if value is not None:
+                socket.setsockopt(option, value)
+
+
+@dataclasses.dataclass(slots=True, frozen=True)
+class ReconnectPolicy:
+    """How a resilient device reconnects to the gateway and catches up afterwards.
+
+    Reconnection itself is left to ZeroMQ, Which backs off exponentially from `initial` up to `maximum`.
+    Each socket starts from a randomly jittered `initial` interval so devices that lost the gateway
+    at the same instant don't retry in lockstep, And backlogs are flushed after a random delay of up to
+    `flush_spread` seconds so they don't all land on a recovering gateway at once.
+    """
+
+    initial: float = 0.1
+    """Seconds before the first reconnection attempt."""
+
+    maximum: float = 30.0
+    """The maximum number of seconds between two reconnection attempts."""
+
+    jitter: float = 0.5
+    """How much to randomize `initial` by, As a fraction of it."""
+
+    flush_spread: float = 1.0
+    """The maximum number of seconds to wait after reconnecting before flushing buffered signals."""
+
+    flush_batch_size: int = 256
+    """The maximum number of buffered signals sent in a single message."""
+
+    def fail_over_delay(self, attempt: int) -> float:
+        """Return the jittered number of seconds to wait before moving on to the next gateway endpoint.
+
+        The delay doubles with every attempt from `initial` up to `maximum`, Like ZeroMQ's own reconnection.
+        """
+        delay = min(self.initial * 2 ** min(attempt, 32), self.maximum)
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def flush_delay(self) -> float:
+        """Return a random number of seconds to wait before flushing buffered signals."""
+        return random.uniform(0, self.flush_spread)
+
+    def apply(self, socket: zmq.Socket[typing.Any]) -> None:
+        """Apply this policy to a socket. This must be called before the socket connects."""
+        initial = self.initial * random.uniform(1 - self.jitter, 1 + self.jitter)
+        socket.setsockopt(zmq.RECONNECT_IVL, max(1, int(initial * 1_000)))
+        socket.setsockopt(zmq.RECONNECT_IVL_MAX, max(1, int(self.maximum * 1_000)))
+        # Only queue messages on established connections, So sends while disconnected fail fast.
+        socket.setsockopt(zmq.IMMEDIATE, 1)
+
+
+DEFAULT: typing.Final[SocketConfig] = SocketConfig()
+"""The default socket config."""
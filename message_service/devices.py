@@ -32,42 +32,141 @@
 from __future__ import annotations
 
 
-__all__ = ("Device", "deserialize_device")
+__all__ = ("Device", "DeviceView", "BroadcastResult", "broadcast", "deserialize_device", "deserialize_devices")
 
 import asyncio
 import dataclasses
-import json
 import logging
+import zlib
+
 import typing
 
 import zmq
 import zmq.asyncio
+import zmq.utils.monitor
+
+from . import backlog as backlog_
+from . import codecs, commands, config, enums, identities, utils, traits
+
+if typing.TYPE_CHECKING:
+    import collections.abc as collections
 
-from . import enums, utils, traits
+    from . import metrics as metrics_
+    from . import pool as pool_
 
 _LOGGER = logging.getLogger("devices")
 
+# Signal frames are shared by every device, Sending a frame with `copy=False` doesn't consume it.
+_SIGNAL_FRAMES: typing.Final[dict[enums.Signal, zmq.Frame]] = {
+    signal: zmq.Frame(codecs.encode_signal(signal)) for signal in enums.Signal
+}
 
-@dataclasses.dataclass(slots=True, unsafe_hash=True)
+
+@dataclasses.dataclass(slots=True, frozen=True)
 class DeviceView:
+    """An immutable view of a device and the last signal it sent.
+
+    Views hash by their host name only.
+    """
+
     host_name: str
-    ip_address: str
-    mac_address: str
-    signal: enums.Signal
+    ip_address: str = dataclasses.field(hash=False)
+    mac_address: str = dataclasses.field(hash=False)
+    signal: enums.Signal = dataclasses.field(hash=False)
+
+
+@dataclasses.dataclass(slots=True, frozen=True)
+class BroadcastResult:
+    """The aggregated result of a fleet-wide `broadcast`."""
+
+    sent: tuple[str, ...]
+    """The host names of the devices that sent the signal."""
+
+    failed: collections.Mapping[str, BaseException]
+    """A mapping from each failed device host name to the error it raised."""
+
+    @property
+    def ok(self) -> bool:
+        """Whether every device sent the signal."""
+        return not self.failed
 
 
 # TODO: Create an async trait for PUSH / PULL socket types.
 
 
 class Device(traits.Push):
+    """A device that pushes its signals to the gateway.
+
+    Parameters
+    ----------
+    host_name : `str | None`
+        The device host name, A random one is generated if not provided.
+    ip_address : `str | None`
+        The device IPv4 address, A random private one is generated if not provided.
+    mac_address : `str | None`
+        The device MAC address, A random one is generated if not provided.
+    endpoint : `str | Sequence[str] | None`
+        The gateway endpoint, Defaults to `tcp://127.0.0.1:5555`. Ignored when `pool` is provided.
+        Given the endpoints of several clustered gateways, The device connects to one of them picked by its
+        host name, And moves on to the next one whenever it loses it if `reconnect` is provided.
+    codec : `traits.Codec | None`
+        The codec used to encode signals, Defaults to the binary codec.
+    socket_config : `config.SocketConfig | None`
+        Socket options for this device's own socket. Ignored when `pool` is provided.
+    pool : `pool.DevicePool | None`
+        If provided, This device sends through the pool's shared sockets
+        instead of creating its own context and socket.
+    heartbeat_interval : `float | None`
+        If provided, A `Signal.HELLO` heartbeat is sent every this many seconds while the device is open.
+    metrics : `metrics.Metrics | None`
+        If provided, Sent signals and send errors are counted into it.
+    command_endpoint : `str | None`
+        If provided, The device connects to the gateway's command channel at this endpoint
+        and handles the commands it receives with `command_handler`.
+    command_handler : `commands.CommandHandler | None`
+        The command handler, Commands are logged and acknowledged if not provided.
+    reconnect : `config.ReconnectPolicy | None`
+        If provided, The device keeps working while the gateway is unreachable. Signals are buffered in `backlog`
+        instead of blocking or raising, And flushed in batches once the device reconnects.
+        Heartbeats aren't buffered. Not supported with `pool`.
+    backlog : `backlog.SignalBacklog | None`
+        The buffer used while disconnected, Defaults to an in-memory backlog of 10,000 signals.
+    heartbeat_endpoint : `str | None`
+        If provided, `Signal.HELLO` heartbeats are sent through a separate socket to the gateway's
+        `heartbeat_address`, Keeping them out of the way of control signals. Ignored when `pool` is provided.
+    """
+
     __slots__ = (
         "_context",
         "_socket",
-        "_endpoint",
+        "_endpoints",
+        "_endpoint_index",
         "_host_name",
         "_ip_address",
         "_connected_event",
-        "_lock" "_mac_address",
+        "_lock",
+        "_mac_address",
+        "_codec",
+        "_socket_config",
+        "_pool",
+        "_pooled",
+        "_identity",
+        "_heartbeat_interval",
+        "_heartbeat",
+        "_metrics",
+        "_command_endpoint",
+        "_command_handler",
+        "_command_socket",
+        "_command_server",
+        "_reconnect",
+        "_backlog",
+        "_online",
+        "_watcher",
+        "_flusher",
+        "_fail_over_timer",
+        "_fail_overs",
+        "_heartbeat_endpoint",
+        "_heartbeat_socket",
     )
 
     def __init__(
@@ -75,30 +174,74 @@ class Device(traits.Push):
         host_name: str | None = None,
         ip_address: str | None = None,
         mac_address: str | None = None,
-        endpoint: str | None = None,
+        endpoint: str | collections.Sequence[str] | None = None,
+        codec: traits.Codec | None = None,
+        socket_config: config.SocketConfig | None = None,
+        pool: pool_.DevicePool | None = None,
+        heartbeat_interval: float | None = None,
+        metrics: metrics_.Metrics | None = None,
+        command_endpoint: str | None = None,
+        command_handler: commands.CommandHandler | None = None,
+        reconnect: config.ReconnectPolicy | None = None,
+        backlog: backlog_.SignalBacklog | None = None,
+        heartbeat_endpoint: str | None = None,
     ) -> None:
+        if reconnect is not None and pool is not None:
+            raise ValueError("Pooled devices can't reconnect on their own, The pool's sockets reconnect already.")
 
         # Connection information.
-        self._context = zmq.asyncio.Context()
+        self._socket_config = socket_config or config.DEFAULT
+        # Pooled devices share the pool's context.
+        self._context = None if pool else self._socket_config.make_context()
         self._socket: zmq.asyncio.Socket | None = None
-        self._endpoint = endpoint
+        if isinstance(endpoint, str):
+            self._endpoints: tuple[str, ...] = (endpoint,)
+        else:
+            self._endpoints = tuple(endpoint or ("tcp://127.0.0.1:5555",))
+        self._pool = pool
+        self._pooled = False
+        self._codec = codec or codecs.BINARY
 
         # Asyncio stuff.
         self._connected_event = asyncio.Event()
         self._lock = asyncio.Lock()
+        self._heartbeat_interval = heartbeat_interval
+        self._heartbeat: asyncio.Task[None] | None = None
+        self._metrics = metrics
+        self._command_endpoint = command_endpoint
+        self._command_handler = command_handler
+        self._command_socket: zmq.asyncio.Socket | None = None
+        self._command_server: asyncio.Task[None] | None = None
+        self._reconnect = reconnect
+        self._backlog = (backlog or backlog_.SignalBacklog()) if reconnect is not None else None
+        # Whether the socket is connected to the gateway, Only tracked when reconnecting.
+        self._online = False
+        self._watcher: asyncio.Task[None] | None = None
+        self._flusher: asyncio.Task[None] | None = None
+        # Moving on to the next endpoint is backed off, Since every reconnect restarts ZeroMQ's own backoff.
+        self._fail_over_timer: asyncio.TimerHandle | None = None
+        self._fail_overs = 0
+        self._heartbeat_endpoint = heartbeat_endpoint
+        self._heartbeat_socket: zmq.asyncio.Socket | None = None
 
         # Device information
-        self._host_name = host_name or utils.generate_random_hostname()
-        self._ip_address = ip_address or utils.generate_random_ipv4_address()
-        self._mac_address = mac_address or utils.generate_random_mac_address()
+        self._host_name = host_name or identities.random_host_name()
+        self._ip_address = ip_address or identities.random_ipv4_address()
+        self._mac_address = mac_address or identities.random_mac_address()
+        # Spreads a fleet evenly over clustered gateways, And always picks the same one for a device.
+        self._endpoint_index = zlib.crc32(self._host_name.encode()) % len(self._endpoints)
+        # The encoded identity, Built on first use and reused by every signal.
+        self._identity: zmq.Frame | None = None
 
     @property
     def endpoint(self) -> str:
-        return self._endpoint if self._endpoint else "tcp://127.0.0.1:5555"
+        if self._pool:
+            return self._pool.endpoint
+        return self._endpoints[self._endpoint_index]
 
     @property
     def is_alive(self) -> bool:
-        return self._socket is not None
+        return self._socket is not None or self._pooled
 
     @property
     def ipv4_address(self) -> str:
@@ -112,33 +255,137 @@ class Device(traits.Push):
     def mac_address(self) -> str:
         return self._mac_address
 
+    @property
+    def codec(self) -> traits.Codec:
+        """The codec used to encode this device's signals."""
+        return self._codec
+
+    def update(self, *, ip_address: str | None = None, mac_address: str | None = None) -> None:
+        """Update this device's addresses, i.e. after it was handed a new IP by `DHCP_IP`.
+
+        Signals sent afterwards carry the new addresses.
+        """
+        if ip_address is not None:
+            self._ip_address = ip_address
+        if mac_address is not None:
+            self._mac_address = mac_address
+
+        self._identity = None
+
     async def open(self) -> None:
         self._connected_event.clear()
 
-        if self._socket is not None:
+        if self.is_alive:
             raise RuntimeError("This device is already running.")
 
-        _LOGGER.info("Connecting to gateway...")
-        self._socket = self._context.socket(zmq.PUSH)
-        self._socket.connect(self._endpoint or "tcp://localhost:5555")
-        _LOGGER.info("Connection opened to gateway...")
+        if self._pool:
+            self._pooled = True
+        else:
+            assert self._context is not None
+            _LOGGER.info("Connecting to gateway...")
+            self._socket = self._context.socket(zmq.PUSH)
+            self._socket_config.apply(self._socket)
+            if self._reconnect is not None:
+                self._reconnect.apply(self._socket)
+                # Monitored before connecting so the first connection is seen as well.
+                monitor = self._socket.get_monitor_socket(
+                    zmq.EVENT_CONNECTED | zmq.EVENT_DISCONNECTED | zmq.EVENT_CONNECT_RETRIED
+                )
+                self._watcher = asyncio.create_task(self._watch(monitor))
+            self._socket.connect(self.endpoint)
+            if self._heartbeat_endpoint:
+                self._heartbeat_socket = self._context.socket(zmq.PUSH)
+                self._socket_config.apply(self._heartbeat_socket)
+                if self._reconnect is not None:
+                    self._reconnect.apply(self._heartbeat_socket)
+                self._heartbeat_socket.connect(self._heartbeat_endpoint)
+            _LOGGER.info("Connection opened to gateway...")
+
+        if self._command_endpoint:
+            if self._pool is not None:
+                context = self._pool.context
+            else:
+                assert self._context is not None
+                context = self._context
+
+            socket = context.socket(zmq.DEALER)
+            # The gateway addresses commands to this device by its host name.
+            socket.setsockopt(zmq.IDENTITY, self._host_name.encode("UTF-8"))
+            self._socket_config.apply(socket)
+            socket.connect(self._command_endpoint)
+            self._command_socket = socket
+            self._command_server = asyncio.create_task(commands.serve_commands(socket, self._command_handler))
+
+        if self._heartbeat_interval:
+            self._heartbeat = asyncio.create_task(self._beat(self._heartbeat_interval))
+
         self._connected_event.set()
 
     async def close(self) -> None:
         """Close the connection for this device."""
-        if not self._socket:
+        if not self.is_alive:
             raise RuntimeError("Socket is already closed.")
 
-        await self.signal(enums.Signal.CLOSE)
-        self._socket.close()
-        self._socket = None
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+
+        if self._command_server is not None:
+            self._command_server.cancel()
+            self._command_server = None
+        if self._command_socket is not None:
+            self._command_socket.close()
+            self._command_socket = None
+
+        try:
+            await self.signal(enums.Signal.CLOSE)
+        finally:
+            # Always release the socket, So the device can be opened again even if the gateway is gone.
+            for task in (self._watcher, self._flusher):
+                if task is not None:
+                    task.cancel()
+            self._watcher = self._flusher = None
+            self._cancel_fail_over()
+            self._online = False
+            if self._backlog:
+                _LOGGER.warning("Device %s closed with %d unsent signals", self.host_name, len(self._backlog))
+
+            if self._socket:
+                if self._reconnect is not None:
+                    self._socket.disable_monitor()
+                self._socket.close()
+                self._socket = None
+            if self._heartbeat_socket is not None:
+                self._heartbeat_socket.close()
+                self._heartbeat_socket = None
+
+            self._pooled = False
 
     async def signal(self, signal: enums.Signal) -> None:
-        """Send a signal to the server for this device."""
+        """Send a signal to the server for this device.
+
+        If the device reconnects on its own and the gateway is unreachable, The signal is buffered instead.
+        """
+        if signal is enums.Signal.HELLO and self._heartbeat_socket is not None:
+            await self._send_heartbeat(self._heartbeat_socket)
+            return
+
+        if self._backlog is not None and (not self._online or self._backlog):
+            # Signals queued before this one must be sent first.
+            self._buffer((signal,))
+            return
+
         async with self._lock:
             try:
-                await self._get_socket().send_multipart([self._unbox(signal)], copy=False)
+                await self._send(self._unbox(signal))
+            except zmq.Again:
+                if self._backlog is None:
+                    raise
+                self._buffer((signal,))
+                return
             except zmq.ZMQError as e:
+                if self._metrics is not None:
+                    self._metrics.send_errors[e.errno or 0] += 1
                 _LOGGER.info(
                     "An error occured while trying to send a signal for device %s. ERRNO: %s",
                     self.host_name,
@@ -146,26 +393,198 @@ class Device(traits.Push):
                 )
                 raise
 
-    def _box(self) -> dict[str, typing.Any]:
-        """Box this device into a Python dict serializing it."""
-        return {
-            "ip_address": self._ip_address,
-            "mac_address": self._mac_address,
-            "host_name": self._host_name,
-        }
+            if self._metrics is not None:
+                self._metrics.sent[signal] += 1
+
+    async def signal_many(self, signals: collections.Iterable[enums.Signal]) -> None:
+        """Send multiple signals to the server for this device in a single multipart message.
+
+        The signals are received and dispatched by the gateway in the same order.
+        """
+        batch = tuple(signals)
+        if self._heartbeat_socket is not None and enums.Signal.HELLO in batch:
+            # Heartbeats take their own lane, Where one is as good as many.
+            batch = tuple(signal for signal in batch if signal is not enums.Signal.HELLO)
+            await self._send_heartbeat(self._heartbeat_socket)
+
+        if not batch:
+            return
 
-    def _unbox(self, signal: enums.Signal) -> bytes:
-        """Unbox this device into bytes to be sent to the gateway.
+        if self._backlog is not None and (not self._online or self._backlog):
+            self._buffer(batch)
+            return
+
+        frames = self._unbox(*batch)
+
+        async with self._lock:
+            try:
+                await self._send(frames)
+            except zmq.Again:
+                if self._backlog is None:
+                    raise
+                self._buffer(batch)
+                return
+            except zmq.ZMQError as e:
+                if self._metrics is not None:
+                    self._metrics.send_errors[e.errno or 0] += 1
+                _LOGGER.info(
+                    "An error occured while trying to send %d signals for device %s. ERRNO: %s",
+                    len(frames) - 1,
+                    self.host_name,
+                    e.errno,
+                )
+                raise
+
+            if self._metrics is not None:
+                for signal in batch:
+                    self._metrics.sent[signal] += 1
+
+    async def _beat(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            if self._backlog is not None and not self._online:
+                # A buffered heartbeat would be stale by the time it's sent.
+                continue
+
+            try:
+                await self.signal(enums.Signal.HELLO)
+            except (zmq.ZMQError, RuntimeError):
+                # Already logged, The next beat will try again.
+                pass
+
+    async def _watch(self, monitor: zmq.asyncio.Socket) -> None:
+        try:
+            while True:
+                event = zmq.utils.monitor.parse_monitor_message(await monitor.recv_multipart())
+                if event["event"] == zmq.EVENT_CONNECTED:
+                    self._online = True
+                    self._cancel_fail_over()
+                    _LOGGER.info("Device %s connected to the gateway", self.host_name)
+                    self._start_flush()
+                elif event["event"] == zmq.EVENT_DISCONNECTED:
+                    self._online = False
+                    _LOGGER.info("Device %s lost the gateway, Buffering signals", self.host_name)
+                    self._schedule_fail_over()
+                elif event["event"] == zmq.EVENT_CONNECT_RETRIED and not self._online:
+                    self._schedule_fail_over()
+        finally:
+            monitor.close()
+
+    async def _send_heartbeat(self, socket: zmq.asyncio.Socket) -> None:
+        try:
+            if self._reconnect is not None:
+                await socket.send_multipart(self._unbox(enums.Signal.HELLO), zmq.NOBLOCK, copy=False)
+            else:
+                await socket.send_multipart(self._unbox(enums.Signal.HELLO), copy=False)
+        except zmq.Again:
+            # The gateway is unreachable, A missed heartbeat is what it should see.
+            return
+        except zmq.ZMQError as e:
+            if self._metrics is not None:
+                self._metrics.send_errors[e.errno or 0] += 1
+            _LOGGER.info(
+                "An error occured while trying to send a heartbeat for device %s. ERRNO: %s",
+                self.host_name,
+                e.errno,
+            )
+            raise
+
+        if self._metrics is not None:
+            self._metrics.sent[enums.Signal.HELLO] += 1
+
+    def _schedule_fail_over(self) -> None:
+        """Move on to the next gateway endpoint after a backoff, If there's more than one."""
+        if len(self._endpoints) < 2 or self._fail_over_timer is not None:
+            return
+
+        assert self._reconnect is not None
+        delay = self._reconnect.fail_over_delay(self._fail_overs)
+        self._fail_overs += 1
+        self._fail_over_timer = asyncio.get_running_loop().call_later(delay, self._fail_over)
+
+    def _cancel_fail_over(self) -> None:
+        if self._fail_over_timer is not None:
+            self._fail_over_timer.cancel()
+            self._fail_over_timer = None
+        self._fail_overs = 0
+
+    def _fail_over(self) -> None:
+        """Move on to the next gateway endpoint, If there's more than one."""
+        self._fail_over_timer = None
+        if len(self._endpoints) < 2 or self._socket is None or self._online:
+            return
+
+        previous = self.endpoint
+        self._endpoint_index = (self._endpoint_index + 1) % len(self._endpoints)
+        self._socket.disconnect(previous)
+        self._socket.connect(self.endpoint)
+        _LOGGER.info("Device %s moving from %s to %s", self.host_name, previous, self.endpoint)
+
+    def _buffer(self, signals: collections.Iterable[enums.Signal]) -> None:
+        assert self._backlog is not None
+        for signal in signals:
+            self._backlog.push(signal)
+        if self._online:
+            self._start_flush()
+
+    def _start_flush(self) -> None:
+        if self._online and self._backlog and (self._flusher is None or self._flusher.done()):
+            self._flusher = asyncio.create_task(self._flush())
+
+    async def _flush(self) -> None:
+        """Send the buffered signals in batches after reconnecting."""
+        assert self._reconnect is not None and self._backlog is not None
+        await asyncio.sleep(self._reconnect.flush_delay())
+
+        backlog = self._backlog
+        while self._online and backlog:
+            batch = backlog.pop_many(self._reconnect.flush_batch_size)
+            async with self._lock:
+                try:
+                    await self._send(self._unbox(*batch))
+                except zmq.Again:
+                    # The gateway isn't keeping up, Back off and try again unless the connection drops meanwhile.
+                    backlog.restore(batch)
+                    asyncio.get_running_loop().call_later(self._reconnect.initial, self._start_flush)
+                    return
+                except zmq.ZMQError:
+                    # Disconnected again, The next connection flushes them.
+                    backlog.restore(batch)
+                    return
+
+            if self._metrics is not None:
+                for signal in batch:
+                    self._metrics.sent[signal] += 1
+
+        if not backlog:
+            _LOGGER.info("Device %s flushed its backlog", self.host_name)
+
+    def _unbox(self, *signals: enums.Signal) -> list[zmq.Frame]:
+        """Unbox this device into the frames to be sent to the gateway.
+
+        The identity frame is encoded once and cached, So this doesn't allocate any new frames.
 
         Parameters
         ----------
-        payload: dict[str, Any] | None
-            If provided, The payload will be sent instead of `Self`.
-            This parameter is usually used to insert extra data to the payload.
+        *signals : `enums.Signal`
+            The signals to send along with this device.
         """
-        dev = self._box()
-        dev['signal'] = signal
-        return json.dumps(dev).encode("UTF-8")
+        if self._identity is None:
+            self._identity = zmq.Frame(self._codec.encode_identity(self))
+
+        frames = [self._identity]
+        frames.extend(_SIGNAL_FRAMES[signal] for signal in signals)
+        return frames
+
+    async def _send(self, frames: list[zmq.Frame]) -> None:
+        if self._pooled:
+            assert self._pool is not None
+            await self._pool.send(self._host_name, frames)
+        elif self._reconnect is not None:
+            # Never wait on a gateway that went away, Failed sends are buffered by the caller.
+            await self._get_socket().send_multipart(frames, zmq.NOBLOCK, copy=False)
+        else:
+            await self._get_socket().send_multipart(frames, copy=False)
 
     def _get_socket(self) -> zmq.asyncio.Socket:
         if self._socket:
@@ -173,11 +592,83 @@ class Device(traits.Push):
 
         raise RuntimeError("Socket closed...")
 
-def deserialize_device(data: list[zmq.Frame]) -> DeviceView:
-    device: dict[str, typing.Any] = json.loads(data[0].bytes)
-    return DeviceView(
-        host_name=device["host_name"],
-        ip_address=device["ip_address"],
-        mac_address=device["mac_address"],
-        signal=enums.Signal(device['signal']),
-    )
+
+async def broadcast(
+    fleet: collections.Iterable[traits.Push],
+    signal: enums.Signal,
+    *,
+    concurrency: int = 256,
+    timeout: float | None = None,
+) -> BroadcastResult:
+    """Send a signal from many devices concurrently.
+
+    Failures don't stop the broadcast, They're collected into the returned result instead.
+
+    Parameters
+    ----------
+    fleet : `Iterable[traits.Push]`
+        The devices to send the signal from.
+    signal : `enums.Signal`
+        The signal to send.
+    concurrency : `int`
+        The maximum number of signals in flight at once.
+    timeout : `float | None`
+        Seconds each device has to send its signal before it's considered failed.
+    """
+    limit = asyncio.Semaphore(concurrency)
+
+    async def send(device: traits.Push) -> BaseException | None:
+        async with limit:
+            try:
+                await asyncio.wait_for(device.signal(signal), timeout)
+            except Exception as exc:
+                return exc
+        return None
+
+    members = tuple(fleet)
+    results = await utils.all_of(*(send(device) for device in members))
+
+    sent: list[str] = []
+    failed: dict[str, BaseException] = {}
+    for device, error in zip(members, results):
+        if error is None:
+            sent.append(device.host_name)
+        else:
+            failed[device.host_name] = error
+
+    return BroadcastResult(sent=tuple(sent), failed=failed)
+
+
+def deserialize_device(data: list[zmq.Frame], codec: traits.Codec | None = None) -> DeviceView:
+    """Deserialize a received multipart message into a view of the first signal in it.
+
+    Parameters
+    ----------
+    data : `list[zmq.Frame]`
+        The received frames.
+    codec : `traits.Codec | None`
+        The codec to decode the identity with, Defaults to the binary codec.
+    """
+    return deserialize_devices(data[:2], codec)[0]
+
+
+def deserialize_devices(data: list[zmq.Frame], codec: traits.Codec | None = None) -> list[DeviceView]:
+    """Deserialize a received multipart message into one view per signal in it.
+
+    Parameters
+    ----------
+    data : `list[zmq.Frame]`
+        The received frames, The identity frame followed by one or more signal frames.
+    codec : `traits.Codec | None`
+        The codec to decode the identity with, Defaults to the binary codec.
+    """
+    host_name, ip_address, mac_address = (codec or codecs.BINARY).decode_identity(data[0].bytes)
+    return [
+        DeviceView(
+            host_name=host_name,
+            ip_address=ip_address,
+            mac_address=mac_address,
+            signal=codecs.decode_signal(frame.bytes),
+        )
+        for frame in data[1:]
+    ]
@@ -0,0 +1,211 @@
+# BSD 3-Clause License
+
+# Copyright (c) 2022-Present, nxtlo
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+
+# * Neither the name of the copyright holder nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""An indexed event dispatcher for device signals."""
+
+from __future__ import annotations
+
+
+__all__ = ("EventDispatcher", "Callback")
+
+import asyncio
+import collections
+import inspect
+import logging
+import typing
+
+from . import enums
+
+if typing.TYPE_CHECKING:
+    import collections.abc as abc
+
+    from . import devices
+
+    Predicate = abc.Callable[[devices.DeviceView], bool]
+
+Callback = typing.Callable[["devices.DeviceView"], typing.Any]
+"""A listener callback, Either a regular function or a coroutine function taking a device view."""
+
+_LOGGER = logging.getLogger("events")
+
+
+class EventDispatcher:
+    """Dispatches device signals to the listeners registered for that signal.
+
+    Listeners are indexed by signal, So dispatching only touches the listeners of the signal that occurred.
+    Regular callbacks are called inline, Coroutine callbacks are scheduled as tasks with at most
+    `max_concurrency` of them running at once. Tasks beyond that limit wait in a backlog of `max_backlog`
+    entries, Anything beyond the backlog is dropped so a slow listener can never stall the receive loop.
+
+    Parameters
+    ----------
+    max_concurrency : `int`
+        The maximum number of coroutine callbacks running at the same time.
+    max_backlog : `int`
+        The maximum number of coroutine callbacks waiting to run.
+    """
+
+    __slots__ = ("_listeners", "_waiters", "_max_concurrency", "_max_backlog", "_running", "_backlog")
+
+    def __init__(self, max_concurrency: int = 64, max_backlog: int = 10_000) -> None:
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be greater than 0.")
+
+        self._listeners: dict[enums.Signal, list[tuple[Callback, bool]]] = {}
+        self._waiters: dict[enums.Signal, list[tuple[Predicate | None, asyncio.Future[devices.DeviceView]]]] = {}
+        self._max_concurrency = max_concurrency
+        self._max_backlog = max_backlog
+        self._running: set[asyncio.Task[typing.Any]] = set()
+        self._backlog: collections.deque[tuple[Callback, devices.DeviceView]] = collections.deque()
+
+    def subscribe(self, signal: enums.Signal, callback: Callback) -> None:
+        """Register a callback to be called whenever this signal is dispatched."""
+        self._listeners.setdefault(signal, []).append((callback, inspect.iscoroutinefunction(callback)))
+
+    def unsubscribe(self, signal: enums.Signal, callback: Callback) -> None:
+        """Remove a previously registered callback.
+
+        Raises
+        ------
+        `LookupError`
+            If the callback isn't registered for this signal.
+        """
+        listeners = self._listeners.get(signal, [])
+        for index, (registered, _) in enumerate(listeners):
+            if registered == callback:
+                del listeners[index]
+                if not listeners:
+                    del self._listeners[signal]
+                return
+
+        raise LookupError(f"{callback!r} is not listening to {signal.name}")
+
+    def listeners(self, signal: enums.Signal) -> list[Callback]:
+        """Return the callbacks registered for this signal."""
+        return [callback for callback, _ in self._listeners.get(signal, ())]
+
+    def signals(self) -> frozenset[enums.Signal]:
+        """Return the signals that have listeners or waiters."""
+        return frozenset(self._listeners).union(signal for signal, waiters in self._waiters.items() if waiters)
+
+    def wait_for(
+        self,
+        signal: enums.Signal,
+        predicate: Predicate | None = None,
+        timeout: float | None = None,
+    ) -> abc.Awaitable[devices.DeviceView]:
+        """Wait for the next dispatch of this signal that matches the predicate.
+
+        Parameters
+        ----------
+        signal : `enums.Signal`
+            The signal to wait for.
+        predicate : `Callable[[DeviceView], bool] | None`
+            An optional check the device must pass.
+        timeout : `float | None`
+            Seconds to wait before raising `asyncio.TimeoutError`.
+        """
+        future: asyncio.Future[devices.DeviceView] = asyncio.get_running_loop().create_future()
+        entry = (predicate, future)
+        self._waiters.setdefault(signal, []).append(entry)
+        return self._wait(signal, entry, timeout)
+
+    async def _wait(
+        self,
+        signal: enums.Signal,
+        entry: tuple[Predicate | None, asyncio.Future[devices.DeviceView]],
+        timeout: float | None,
+    ) -> devices.DeviceView:
+        try:
+            return await asyncio.wait_for(entry[1], timeout)
+        finally:
+            waiters = self._waiters.get(signal)
+            if waiters and entry in waiters:
+                waiters.remove(entry)
+
+    def dispatch(self, signal: enums.Signal, device: devices.DeviceView) -> None:
+        """Dispatch a signal to its listeners and waiters."""
+        if waiters := self._waiters.get(signal):
+            self._resolve(waiters, device)
+
+        for callback, is_async in self._listeners.get(signal, ()):
+            if is_async:
+                self._schedule(callback, device)
+                continue
+
+            try:
+                callback(device)
+            except Exception:
+                _LOGGER.exception("Listener %r failed while handling %s", callback, signal.name)
+
+    def _resolve(
+        self,
+        waiters: list[tuple[Predicate | None, asyncio.Future[devices.DeviceView]]],
+        device: devices.DeviceView,
+    ) -> None:
+        for entry in tuple(waiters):
+            predicate, future = entry
+            if future.done():
+                continue
+
+            try:
+                if predicate is None or predicate(device):
+                    future.set_result(device)
+            except Exception as exc:
+                future.set_exception(exc)
+
+    def _schedule(self, callback: Callback, device: devices.DeviceView) -> None:
+        if len(self._running) < self._max_concurrency:
+            task = asyncio.create_task(callback(device))
+            self._running.add(task)
+            task.add_done_callback(self._on_done)
+        elif len(self._backlog) < self._max_backlog:
+            self._backlog.append((callback, device))
+        else:
+            _LOGGER.warning("Listener backlog is full, Dropping %r for %s", callback, device.host_name)
+
+    def _on_done(self, task: asyncio.Task[typing.Any]) -> None:
+        self._running.discard(task)
+        if not task.cancelled() and (exc := task.exception()) is not None:
+            _LOGGER.error("Listener task %r failed", task, exc_info=exc)
+
+        if self._backlog:
+            self._schedule(*self._backlog.popleft())
+
+    def cancel(self) -> None:
+        """Cancel every running listener task and clear the backlog and waiters."""
+        self._backlog.clear()
+        for task in tuple(self._running):
+            task.cancel()
+
+        for waiters in self._waiters.values():
+            for _, future in waiters:
+                future.cancel()
+        self._waiters.clear()
@@ -32,34 +32,218 @@
 from __future__ import annotations
 
 
-__all__ = ("Gateway",)
+__all__ = ("Gateway", "recv_batch", "drain")
 
 import logging
 import asyncio
+import dataclasses
+import struct
+import time
 import typing
 import functools
 
 import zmq
 import zmq.asyncio
 
-from . import devices, enums, traits
+from . import codecs, commands, config, enums, events, liveness, registry, traits
+from . import devices as devices_
+from . import metrics as metrics_
 
 if typing.TYPE_CHECKING:
     import collections.abc as collections
 
-logging.basicConfig(level=logging.DEBUG)
+    from . import persistence, ratelimit
+
 _LOGGER = logging.getLogger("connector")
 
+_MALFORMED: typing.Final[tuple[type[Exception], ...]] = (KeyError, IndexError, ValueError, struct.error)
+"""What decoding a malformed message raises, `UnicodeDecodeError` and JSON errors are `ValueError`s."""
+
+
+async def recv_batch(
+    socket: zmq.asyncio.Socket, batch_size: int, time_budget: float | None = None
+) -> list[list[zmq.Frame]]:
+    """Wait for a message then drain every message that is already queued without blocking.
+
+    Parameters
+    ----------
+    socket : `zmq.asyncio.Socket`
+        The socket to receive from.
+    batch_size : `int`
+        The maximum number of messages to return.
+    time_budget : `float | None`
+        The maximum time in seconds to spend draining the queue.
+    """
+    batch: list[list[zmq.Frame]] = [await socket.recv_multipart(copy=False)]
+    if batch_size > 1:
+        batch.extend(await drain(socket, batch_size - 1, time_budget))
+    return batch
+
+
+async def drain(socket: zmq.asyncio.Socket, limit: int, time_budget: float | None = None) -> list[list[zmq.Frame]]:
+    """Receive the messages that are already queued without blocking.
+
+    Parameters
+    ----------
+    socket : `zmq.asyncio.Socket`
+        The socket to receive from.
+    limit : `int`
+        The maximum number of messages to return.
+    time_budget : `float | None`
+        The maximum time in seconds to spend draining the queue.
+    """
+    batch: list[list[zmq.Frame]] = []
+    deadline = None if time_budget is None else time.monotonic() + time_budget
+    while len(batch) < limit:
+        try:
+            # A non-blocking receive resolves immediately, So awaiting it won't yield to the loop.
+            batch.append(await socket.recv_multipart(zmq.NOBLOCK, copy=False))
+        except zmq.Again:
+            break
+
+        if deadline is not None and time.monotonic() >= deadline:
+            break
+
+    return batch
+
+
+def _decode_batch(batch: list[list[zmq.Frame]], device_registry: registry.DeviceRegistry) -> list[devices_.DeviceView]:
+    # Frames support the buffer protocol, pyzmq's stubs just don't declare it.
+    resolve = typing.cast(
+        "collections.Callable[[zmq.Frame, enums.Signal], devices_.DeviceView]", device_registry.resolve
+    )
+    decode_signal = codecs.decode_signal
+    # Identity frames are resolved in place, `Frame.bytes` would copy them and a `Frame.buffer` view costs
+    # more than the copy. Signal frames are a single byte, So `bytes` returns the interpreter's shared objects.
+    try:
+        return [resolve(data[0], decode_signal(frame.bytes)) for data in batch for frame in data[1:]]
+    except _MALFORMED:
+        pass
+
+    # Only a batch holding a malformed message pays for decoding each message on its own.
+    views: list[devices_.DeviceView] = []
+    for data in batch:
+        try:
+            views.extend([resolve(data[0], decode_signal(frame.bytes)) for frame in data[1:]])
+        except _MALFORMED:
+            _LOGGER.warning("Dropping a malformed message of %d frames", len(data))
+
+    return views
 
-class Gateway(traits.Pull):
-    __slots__ = ("_context", "_socket", "_devices", "_address", "_lock")
 
-    def __init__(self, address: str | None = None) -> None:
-        self._context = zmq.asyncio.Context()
+class Gateway(traits.Pull):
+    """The gateway that devices push their signals to.
+
+    Parameters
+    ----------
+    address : `str | None`
+        The address to bind to, Defaults to `tcp://127.0.0.1:5555`.
+    codec : `traits.Codec | None`
+        The codec used to decode device signals, Defaults to the binary codec.
+    batch_size : `int`
+        The maximum number of already queued messages to drain and dispatch per wakeup.
+        Setting this to `1` dispatches each message as soon as it is received.
+    batch_time_budget : `float | None`
+        The maximum time in seconds to spend draining a single batch.
+        If `None`, Batches are only bounded by `batch_size`.
+    socket_config : `config.SocketConfig | None`
+        High-water marks, Buffer sizes and other socket options, Defaults to `config.DEFAULT`.
+    max_listener_concurrency : `int`
+        The maximum number of coroutine listeners running at the same time.
+    heartbeat_timeout : `float | None`
+        If provided, Registered devices that send nothing for this many seconds are evicted
+        as if they sent `Signal.CLOSE`. Devices are expected to send periodic `Signal.HELLO` heartbeats.
+    metrics : `metrics.Metrics | None`
+        If provided, Receive counts, Decode and dispatch times, Loop lag and batch sizes are recorded into it.
+    store : `persistence.RegistryStore | None`
+        If provided, The registry is recovered from it when the gateway opens and every change is logged to it.
+    command_address : `str | None`
+        If provided, A command channel is bound to this address so `command` and `command_many`
+        can send commands to the devices connected to it.
+    heartbeat_address : `str | None`
+        If provided, A second socket is bound to this address for `Signal.HELLO` heartbeats of devices
+        created with a `heartbeat_endpoint`, So floods of heartbeats never queue in front of control signals.
+    lane_weights : `tuple[int, int]`
+        The share of control signals to heartbeats drained per round when `heartbeat_address` is set.
+        Control signals are always drained first, And heartbeats still get their share under sustained control load.
+    rate_limiter : `ratelimit.RateLimiter | None`
+        If provided, Received messages over their device's rate limit are dropped or deferred before
+        they're applied, So a few misbehaving devices can't monopolise dispatching.
+    """
+
+    __slots__ = (
+        "_context",
+        "_socket",
+        "_devices",
+        "_address",
+        "_lock",
+        "_codec",
+        "_batch_size",
+        "_batch_time_budget",
+        "_socket_config",
+        "_dispatcher",
+        "_heartbeat_timeout",
+        "_liveness",
+        "_reaper",
+        "_metrics",
+        "_lag_monitor",
+        "_store",
+        "_commands",
+        "_heartbeat_address",
+        "_heartbeat_socket",
+        "_lane_weights",
+        "_rate_limiter",
+        "_releaser",
+    )
+
+    def __init__(
+        self,
+        address: str | None = None,
+        codec: traits.Codec | None = None,
+        *,
+        batch_size: int = 256,
+        batch_time_budget: float | None = 0.005,
+        socket_config: config.SocketConfig | None = None,
+        max_listener_concurrency: int = 64,
+        heartbeat_timeout: float | None = None,
+        metrics: metrics_.Metrics | None = None,
+        store: persistence.RegistryStore | None = None,
+        command_address: str | None = None,
+        heartbeat_address: str | None = None,
+        lane_weights: tuple[int, int] = (4, 1),
+        rate_limiter: ratelimit.RateLimiter | None = None,
+    ) -> None:
+        if batch_size < 1:
+            raise ValueError("batch_size must be greater than 0.")
+        if min(lane_weights) < 1:
+            raise ValueError("lane_weights must be greater than 0.")
+
+        self._socket_config = socket_config or config.DEFAULT
+        self._context = self._socket_config.make_context()
         self._socket: zmq.asyncio.Socket | None = None
-        self._devices: dict[str, devices.DeviceView] = {}
+        self._codec = codec or codecs.BINARY
+        self._devices = registry.DeviceRegistry(self._codec)
         self._address = address or "tcp://127.0.0.1:5555"
         self._lock = asyncio.Lock()
+        self._batch_size = batch_size
+        self._batch_time_budget = batch_time_budget
+        self._dispatcher = events.EventDispatcher(max_listener_concurrency)
+        self._heartbeat_timeout = heartbeat_timeout or 0.0
+        self._liveness = liveness.TimerWheel(heartbeat_timeout / 8) if heartbeat_timeout else None
+        self._reaper: asyncio.Task[None] | None = None
+        self._metrics = metrics
+        self._lag_monitor: asyncio.Task[None] | None = None
+        self._store = store
+        self._commands = (
+            commands.CommandChannel(command_address, socket_config=self._socket_config, context=self._context)
+            if command_address
+            else None
+        )
+        self._heartbeat_address = heartbeat_address
+        self._heartbeat_socket: zmq.asyncio.Socket | None = None
+        self._lane_weights = lane_weights
+        self._rate_limiter = rate_limiter
+        self._releaser: asyncio.Task[None] | None = None
 
     @property
     def is_alive(self) -> bool:
@@ -70,50 +254,298 @@ class Gateway(traits.Pull):
         return self._address
 
     @property
-    def devices(self) -> collections.Mapping[str, devices.DeviceView]:
+    def codec(self) -> traits.Codec:
+        """The codec used to decode incoming device signals."""
+        return self._codec
+
+    @property
+    def metrics(self) -> metrics_.Metrics | None:
+        """The metrics this gateway records into, If enabled."""
+        return self._metrics
+
+    @property
+    def devices(self) -> registry.DeviceRegistry:
         return self._devices
 
+    @property
+    def rate_limiter(self) -> ratelimit.RateLimiter | None:
+        """The rate limiter received messages go through, If enabled."""
+        return self._rate_limiter
+
     async def open(self) -> None:
         if self._socket is not None:
             raise RuntimeError("Sockset is already running.")
 
+        if self._store is not None:
+            await self._store.open(self._devices)
+            if self._liveness is not None:
+                # Recovered devices get a full timeout to show they're still alive.
+                deadline = time.monotonic() + self._heartbeat_timeout
+                for host_name in self._devices:
+                    self._liveness.schedule(host_name, deadline)
+
         self._socket = self._context.socket(zmq.PULL)
 
-        self._socket.set_hwm(1)
+        self._socket_config.apply(self._socket)
         self._socket.bind(self._address)
+        if self._heartbeat_address is not None:
+            self._heartbeat_socket = self._context.socket(zmq.PULL)
+            self._socket_config.apply(self._heartbeat_socket)
+            self._heartbeat_socket.bind(self._heartbeat_address)
 
         _LOGGER.info("Connected to gateway...")
+        if self._commands is not None:
+            await self._commands.open()
+        if self._liveness is not None:
+            self._reaper = asyncio.create_task(self._reap(self._liveness))
+        if self._metrics is not None:
+            self._lag_monitor = asyncio.create_task(self._monitor_lag(self._metrics))
+        if self._rate_limiter is not None:
+            self._releaser = asyncio.create_task(self._release(self._rate_limiter))
+
         await self._run_once()
 
     async def close(self) -> None:
         if not self._socket:
             raise RuntimeError("Socket is already closed.")
 
+        for task in (self._reaper, self._lag_monitor, self._releaser):
+            if task is not None:
+                task.cancel()
+        self._reaper = self._lag_monitor = self._releaser = None
+
         self._socket.close()
+        self._socket = None
+        if self._heartbeat_socket is not None:
+            self._heartbeat_socket.close()
+            self._heartbeat_socket = None
+        self._dispatcher.cancel()
+        if self._commands is not None:
+            await self._commands.close()
+        if self._store is not None:
+            await self._store.close()
+
+    async def listen(self, signal: enums.Signal, callback: events.Callback) -> None:
+        """Listen for a device signal to occur.
+
+        Regular callbacks are called inline within the receive loop, So they must be fast.
+        Coroutine callbacks are scheduled as tasks.
+
+        Parameters
+        ----------
+        signal : `enums.Signal`
+            The signal to listen to.
+        callback : `events.Callback`
+            The callback to call with the view of the device that sent the signal.
+        """
+        self._dispatcher.subscribe(signal, callback)
+
+    def remove_listener(self, signal: enums.Signal, callback: events.Callback) -> None:
+        """Remove a callback that was registered with `listen`."""
+        self._dispatcher.unsubscribe(signal, callback)
+
+    async def wait_for(
+        self,
+        signal: enums.Signal,
+        predicate: collections.Callable[[devices_.DeviceView], bool] | None = None,
+        timeout: float | None = None,
+    ) -> devices_.DeviceView:
+        """Wait for a single device signal to occur.
+
+        Parameters
+        ----------
+        signal : `enums.Signal`
+            The signal to wait for.
+        predicate : `Callable[[DeviceView], bool] | None`
+            An optional check the device must pass.
+        timeout : `float | None`
+            Seconds to wait before raising `asyncio.TimeoutError`.
+        """
+        return await self._dispatcher.wait_for(signal, predicate, timeout)
+
+    def query(
+        self,
+        *,
+        network: str | None = None,
+        oui: str | None = None,
+        signal: enums.Signal | None = None,
+    ) -> list[devices_.DeviceView]:
+        """Return the registered devices matching every given filter, See `registry.DeviceRegistry.query`.
+
+        Example
+        -------
+        ```py
+        restarting = server.query(network="10.2.0.0/16", signal=enums.Signal.RESTART)
+        ```
+        """
+        return self._devices.query(network=network, oui=oui, signal=signal)
+
+    async def command(self, host_name: str, command: enums.Signal, timeout: float | None = None) -> commands.Reply:
+        """Send a command to a device and wait for its reply.
+
+        Parameters
+        ----------
+        host_name : `str`
+            The host name of the device.
+        command : `enums.Signal`
+            The command to send, i.e. `Signal.RESTART`.
+        timeout : `float | None`
+            Seconds to wait for the reply, Defaults to 5 seconds.
+
+        Raises
+        ------
+        `RuntimeError`
+            If the gateway has no command channel.
+        `ValueError`
+            If the signal isn't one of `commands.COMMANDS`.
+        `LookupError`
+            If the device isn't connected to the command channel.
+        `commands.CommandError`
+            If the device replied with an error.
+        `asyncio.TimeoutError`
+            If the device didn't reply in time.
+        """
+        return await self._get_commands().request(host_name, command, timeout)
+
+    async def command_many(
+        self,
+        host_names: collections.Iterable[str],
+        command: enums.Signal,
+        timeout: float | None = None,
+    ) -> commands.CommandResult:
+        """Send a command to many devices at once and wait for their replies.
+
+        Every command is sent before waiting for any reply, So the devices are handled in a single round trip.
+
+        Parameters
+        ----------
+        host_names : `Iterable[str]`
+            The host names of the devices, i.e. `gateway.devices`.
+        command : `enums.Signal`
+            The command to send.
+        timeout : `float | None`
+            Seconds to wait for all the replies, Defaults to 5 seconds.
+
+        Raises
+        ------
+        `ValueError`
+            If the signal isn't one of `commands.COMMANDS`.
+        """
+        return await self._get_commands().request_many(host_names, command, timeout)
+
+    def log_devices(self, level: int = logging.INFO) -> None:
+        """Log every registered device once.
+
+        Registering a device doesn't log the registry, Call this when a dump is needed.
+
+        Parameters
+        ----------
+        level : `int`
+            The level to log the devices at.
+        """
+        if _LOGGER.isEnabledFor(level):
+            _LOGGER.log(level, "%d registered devices: %s", len(self._devices), self._devices)
 
     def _dispatch(self, data: list[zmq.Frame], signal: enums.Signal | None = None) -> None:
-        dev = devices.deserialize_device(data)
-        _LOGGER.debug(
-            "Device IP: %s Name: %s Event: %s",
-            dev.ip_address,
-            dev.host_name,
-            dev.signal.name,
-        )
-
-        sig = signal or dev.signal
+        self._dispatch_batch([data], signal)
+
+    def _dispatch_batch(self, batch: list[list[zmq.Frame]], signal: enums.Signal | None = None) -> None:
+        if (stats := self._metrics) is not None:
+            started = time.perf_counter()
+
+        views = _decode_batch(batch, self._devices)
+        admitted = views
+        if (limiter := self._rate_limiter) is not None:
+            admit = limiter.admit
+            now = time.monotonic()
+            admitted = [dev for dev in views if admit(dev, now)]
+
+        if stats is None:
+            for dev in admitted:
+                self._apply(dev, signal)
+            return
+
+        decoded = time.perf_counter()
+        received = stats.received
+        for dev in views:
+            received[dev.signal] += 1
+        for dev in admitted:
+            self._apply(dev, signal)
+
+        stats.decode_seconds.observe(decoded - started)
+        stats.dispatch_seconds.observe(time.perf_counter() - decoded)
+        stats.batch_size.observe(len(batch))
+
+    def _apply(self, dev: devices_.DeviceView, signal: enums.Signal | None = None) -> None:
+        sig = dev.signal if signal is None else signal
+        # Checked first so a disabled debug level costs neither a record nor its formatting.
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug(
+                "Device IP: %s Name: %s Event: %s",
+                dev.ip_address,
+                dev.host_name,
+                sig.name,
+                extra={"host_name": dev.host_name, "ip_address": dev.ip_address, "signal": sig.name},
+            )
+
+        store = self._store
         match sig:
-            case enums.Signal.OPEN if dev not in self._devices:
-                self._devices[dev.host_name] = dev
-                _LOGGER.info("%s", self._devices)
+            case enums.Signal.OPEN:
+                if self._devices.put(dev):
+                    # No host_name extra, So DeviceRateLimitFilter only throttles the per-event record above.
+                    _LOGGER.debug("Device %s registered", dev.host_name)
+                    if store is not None:
+                        store.put(dev)
             case enums.Signal.CLOSE:
-                del self._devices[dev.host_name]
-            case enums.Signal.RESTART:
-                # Access device hardware or API to restart?
-                _LOGGER.info("Restarting device %s", dev.host_name)
-            case enums.Signal.HELLO:
-                _LOGGER.info("Device %s sent signal HELLO", dev.host_name)
-            case _:
-                return
+                if self._devices.remove(dev.host_name) is not None and store is not None:
+                    store.remove(dev.host_name)
+            case _ if dev.host_name in self._devices:
+                # Registered devices keep track of the last signal they sent.
+                if self._devices.put(dev) and store is not None:
+                    store.put(dev)
+
+        if (wheel := self._liveness) is not None:
+            if dev.host_name in self._devices:
+                wheel.schedule(dev.host_name, time.monotonic() + self._heartbeat_timeout)
+            else:
+                wheel.cancel(dev.host_name)
+
+        if sig is enums.Signal.RESTART:
+            # Access device hardware or API to restart?
+            _LOGGER.info("Restarting device %s", dev.host_name, extra={"host_name": dev.host_name})
+
+        self._dispatcher.dispatch(sig, dev)
+
+    async def _reap(self, wheel: liveness.TimerWheel) -> None:
+        """Evict the devices that missed their heartbeats."""
+        while True:
+            await asyncio.sleep(wheel.resolution)
+            for host_name in wheel.advance(time.monotonic()):
+                if (dev := self._devices.get(host_name)) is not None:
+                    _LOGGER.info("Device %s missed its heartbeat, Evicting.", host_name)
+                    self._apply(dataclasses.replace(dev, signal=enums.Signal.CLOSE))
+
+    async def _release(self, limiter: ratelimit.RateLimiter) -> None:
+        """Dispatch the deferred messages of devices that are under their rate limits again."""
+        interval = limiter.release_interval
+        while True:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            for dev in limiter.release(now):
+                self._apply(dev)
+            limiter.evict_idle(now)
+
+    async def _monitor_lag(self, stats: metrics_.Metrics, interval: float = 0.1) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + interval
+            await asyncio.sleep(interval)
+            stats.loop_lag_seconds.observe(max(0.0, loop.time() - expected))
+
+    def _get_commands(self) -> commands.CommandChannel:
+        if self._commands is None:
+            raise RuntimeError("This gateway has no command channel, Pass a command_address to enable it.")
+        return self._commands
 
     def _get_socket(self) -> zmq.asyncio.Socket:
         if self._socket:
@@ -123,13 +555,38 @@ class Gateway(traits.Pull):
 
     async def _run_once(self, signal: enums.Signal | None = None) -> None:
         socket = self._get_socket()
+        if self._heartbeat_socket is not None:
+            await self._run_lanes(socket, self._heartbeat_socket, signal)
+            return
+
         async with self._lock:
             while True:
                 try:
-                    # {'ip_address': '...', 'signal': '...'}
-                    buffer = await socket.recv_multipart(copy=False)
+                    batch = await recv_batch(socket, self._batch_size, self._batch_time_budget)
                 except zmq.ZMQError:
                     _LOGGER.error("Error occurred while trying to recive data.")
                     raise
 
-                self._dispatch(buffer, signal)
+                self._dispatch_batch(batch, signal)
+
+    async def _run_lanes(
+        self, control: zmq.asyncio.Socket, heartbeats: zmq.asyncio.Socket, signal: enums.Signal | None = None
+    ) -> None:
+        poller = zmq.asyncio.Poller()
+        poller.register(control, zmq.POLLIN)
+        poller.register(heartbeats, zmq.POLLIN)
+
+        control_weight, heartbeat_weight = self._lane_weights
+        heartbeat_batch_size = max(1, self._batch_size * heartbeat_weight // control_weight)
+        async with self._lock:
+            while True:
+                try:
+                    await poller.poll()
+                    # A control signal waits for at most one round of heartbeats, However many are queued.
+                    if batch := await drain(control, self._batch_size, self._batch_time_budget):
+                        self._dispatch_batch(batch, signal)
+                    if batch := await drain(heartbeats, heartbeat_batch_size, self._batch_time_budget):
+                        self._dispatch_batch(batch, signal)
+                except zmq.ZMQError:
+                    _LOGGER.error("Error occurred while trying to recive data.")
+                    raise
@@ -0,0 +1,123 @@
+# BSD 3-Clause License
+
+# Copyright (c) 2022-Present, nxtlo
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+
+# * Neither the name of the copyright holder nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""Device identity generation.
+
+The `random_*` generators only use the standard library and are what devices fall back to when they're created
+without an explicit identity. `fake_identity` produces more realistic identities using Faker,
+Which is only imported the first time it's called.
+"""
+
+from __future__ import annotations
+
+
+__all__ = (
+    "random_host_name",
+    "random_ipv4_address",
+    "random_mac_address",
+    "random_identity",
+    "fake_identity",
+)
+
+import functools
+import os
+import random
+import typing
+
+from . import codecs
+
+if typing.TYPE_CHECKING:
+    import faker
+
+_HOST_NAME_PREFIXES: typing.Final[tuple[str, ...]] = ("desktop", "laptop", "lt", "srv", "web", "db", "email")
+
+# Seeded from `os.urandom` and reseeded after forks, So separate processes don't generate the same identities.
+# `secrets` isn't used as pulling in `hmac` and `hashlib` would double this module's import time.
+_random = random.Random()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_random.seed)
+
+
+def random_host_name() -> str:
+    """Generate a random host name, e.g. `srv-5a0c93e1`.
+
+    The 32 random bits make collisions unlikely within fleets of tens of thousands of devices.
+    """
+    return f"{_random.choice(_HOST_NAME_PREFIXES)}-{_random.getrandbits(32):08x}"
+
+
+def random_ipv4_address() -> str:
+    """Generate a random private IPv4 address from the `10/8`, `172.16/12` or `192.168/16` ranges."""
+    bits = _random.getrandbits(24)
+    match bits % 3:
+        case 0:
+            return f"10.{bits >> 16 & 0xFF}.{bits >> 8 & 0xFF}.{bits & 0xFF or 1}"
+        case 1:
+            return f"172.{16 + (bits >> 16 & 0x0F)}.{bits >> 8 & 0xFF}.{bits & 0xFF or 1}"
+        case _:
+            return f"192.168.{bits >> 8 & 0xFF}.{bits & 0xFF or 1}"
+
+
+def random_mac_address() -> str:
+    """Generate a random locally administered unicast MAC address."""
+    octets = _random.getrandbits(48).to_bytes(6, "big")
+    # Set the locally administered bit and clear the multicast bit of the first octet.
+    first = octets[0] & 0xFC | 0x02
+    return ":".join(f"{octet:02x}" for octet in (first, *octets[1:]))
+
+
+def random_identity() -> codecs.Identity:
+    """Generate a random identity using the standard library generators."""
+    return codecs.Identity(random_host_name(), random_ipv4_address(), random_mac_address())
+
+
+@functools.cache
+def _faker() -> faker.Faker:
+    import faker
+    import faker.providers.internet as internet
+
+    fake = faker.Faker()
+    fake.add_provider(internet)
+    return fake
+
+
+def fake_identity() -> codecs.Identity:
+    """Generate a realistic looking identity using Faker.
+
+    Faker is imported and set up on the first call, Which takes a noticeable amount of time.
+
+    Raises
+    ------
+    `ImportError`
+        If Faker isn't installed.
+    """
+    fake = _faker()
+    return codecs.Identity(fake.hostname(0), fake.ipv4_private(), fake.mac_address())
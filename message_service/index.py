@@ -0,0 +1,229 @@
+# BSD 3-Clause License
+
+# Copyright (c) 2022-Present, nxtlo
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+
+# * Neither the name of the copyright holder nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""Secondary indexes of the device registry."""
+
+from __future__ import annotations
+
+
+__all__ = ("IPv4Trie", "OUIIndex", "parse_network")
+
+import typing
+
+if typing.TYPE_CHECKING:
+    import collections.abc as collections
+
+# Octet -> child node, Or -> host names at the last level.
+_Node = dict[int, typing.Any]
+
+
+def parse_network(network: str) -> tuple[int, int]:
+    """Parse an IPv4 network such as `10.2.0.0/16` into its address as an integer and its prefix length.
+
+    A plain address is a `/32` network. Host bits set in the address are ignored.
+
+    Raises
+    ------
+    `ValueError`
+        If the network is invalid.
+    """
+    address, _, prefix = network.partition("/")
+    octets = address.split(".")
+    length = int(prefix) if prefix else 32
+    if len(octets) != 4 or not 0 <= length <= 32:
+        raise ValueError(f"Invalid IPv4 network {network!r}")
+
+    value = 0
+    for octet in octets:
+        number = int(octet)
+        if not 0 <= number <= 255:
+            raise ValueError(f"Invalid IPv4 network {network!r}")
+        value = value << 8 | number
+
+    mask = (0xFFFFFFFF << (32 - length)) & 0xFFFFFFFF
+    return value & mask, length
+
+
+def _octets(ip_address: str) -> list[int] | None:
+    parts = ip_address.split(".")
+    if len(parts) != 4 or not all(part.isdecimal() for part in parts):
+        return None
+
+    octets = [int(part) for part in parts]
+    return octets if all(octet <= 255 for octet in octets) else None
+
+
+class IPv4Trie:
+    """A 256-ary radix trie of host names by IPv4 address, One level per octet.
+
+    Looking up a network only visits the octets within it, So it costs roughly the size of the result.
+    Addresses that aren't dotted IPv4 addresses, Such as IPv6 ones, Are not indexed.
+    """
+
+    __slots__ = ("_root", "_size")
+
+    def __init__(self) -> None:
+        self._root: _Node = {}
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, ip_address: str, host_name: str) -> None:
+        if (octets := _octets(ip_address)) is None:
+            return
+
+        node = self._root
+        *path, last = octets
+        for octet in path:
+            node = node.setdefault(octet, {})
+
+        hosts: set[str] = node.setdefault(last, set())
+        if host_name not in hosts:
+            hosts.add(host_name)
+            self._size += 1
+
+    def discard(self, ip_address: str, host_name: str) -> None:
+        if (octets := _octets(ip_address)) is None:
+            return
+
+        nodes = [self._root]
+        for octet in octets[:-1]:
+            child = nodes[-1].get(octet)
+            if child is None:
+                return
+            nodes.append(child)
+
+        hosts: set[str] | None = nodes[-1].get(octets[-1])
+        if hosts is None or host_name not in hosts:
+            return
+
+        hosts.discard(host_name)
+        self._size -= 1
+        if hosts:
+            return
+
+        # Prune the branches left empty.
+        del nodes[-1][octets[-1]]
+        for depth in range(len(nodes) - 1, 0, -1):
+            if nodes[depth]:
+                break
+            del nodes[depth - 1][octets[depth - 1]]
+
+    def search(self, network: str) -> set[str]:
+        """Return the host names with an address within an IPv4 network such as `10.2.0.0/16`."""
+        address, length = parse_network(network)
+        result: set[str] = set()
+        self._collect(self._root, 0, address, length, result)
+        return result
+
+    def _collect(self, node: _Node, depth: int, address: int, length: int, result: set[str]) -> None:
+        octet = address >> (24 - depth * 8) & 0xFF
+        fixed = min(8, max(0, length - depth * 8))
+        last = depth == 3
+
+        if fixed == 8:
+            child = node.get(octet)
+            if child is None:
+                return
+            if last:
+                result.update(child)
+            else:
+                self._collect(child, depth + 1, address, length, result)
+            return
+
+        # The network ends within this octet, Every child in its range matches entirely.
+        low = octet
+        high = octet + (1 << (8 - fixed))
+        children: collections.Iterable[int] = (
+            range(low, high) if high - low < len(node) else (key for key in node if low <= key < high)
+        )
+        for key in children:
+            child = node.get(key)
+            if child is None:
+                continue
+            if last:
+                result.update(child)
+            else:
+                self._collect_all(child, depth + 1, result)
+
+    def _collect_all(self, node: _Node, depth: int, result: set[str]) -> None:
+        if depth == 3:
+            for hosts in node.values():
+                result.update(hosts)
+            return
+
+        for child in node.values():
+            self._collect_all(child, depth + 1, result)
+
+
+class OUIIndex:
+    """Host names bucketed by the vendor prefix, The first three octets, Of their MAC address.
+
+    MAC addresses too short to have a vendor prefix are not indexed.
+    """
+
+    __slots__ = ("_buckets",)
+
+    def __init__(self) -> None:
+        self._buckets: dict[str, set[str]] = {}
+
+    @staticmethod
+    def normalize(prefix: str) -> str:
+        """Normalize a MAC address or vendor prefix such as `AA-BB-CC` or `aabbcc` into `aa:bb:cc`."""
+        digits = prefix.replace(":", "").replace("-", "").replace(".", "").lower()[:6]
+        if len(digits) != 6:
+            raise ValueError(f"Invalid MAC vendor prefix {prefix!r}")
+        return f"{digits[0:2]}:{digits[2:4]}:{digits[4:6]}"
+
+    def add(self, mac_address: str, host_name: str) -> None:
+        try:
+            oui = self.normalize(mac_address)
+        except ValueError:
+            return
+
+        self._buckets.setdefault(oui, set()).add(host_name)
+
+    def discard(self, mac_address: str, host_name: str) -> None:
+        try:
+            oui = self.normalize(mac_address)
+        except ValueError:
+            return
+
+        bucket = self._buckets.get(oui)
+        if bucket is not None:
+            bucket.discard(host_name)
+            if not bucket:
+                del self._buckets[oui]
+
+    def search(self, prefix: str) -> collections.Set[str]:
+        """Return the host names whose MAC address starts with a vendor prefix."""
+        return self._buckets.get(self.normalize(prefix), frozenset())
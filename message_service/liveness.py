@@ -0,0 +1,133 @@
+# BSD 3-Clause License
+
+# Copyright (c) 2022-Present, nxtlo
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+
+# * Neither the name of the copyright holder nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Heartbeat based liveness tracking."""
+
+from __future__ import annotations
+
+
+__all__ = ("TimerWheel",)
+
+import typing
+
+if typing.TYPE_CHECKING:
+    import collections.abc as collections
+
+
+class TimerWheel:
+    """A hashed timer wheel that tracks a deadline per key.
+
+    Scheduling, Rescheduling and cancelling a key are O(1). Advancing the wheel only visits the slots
+    that elapsed since the last advance, So the cost of a tick doesn't depend on how many keys are tracked.
+    Deadlines further away than a full revolution are kept in their slot until a later revolution reaches them.
+
+    Parameters
+    ----------
+    resolution : `float`
+        The duration in seconds of a single slot. Keys expire at most this late.
+    slots : `int`
+        The number of slots in the wheel.
+    """
+
+    __slots__ = ("_resolution", "_slots", "_deadlines", "_slot_of", "_tick")
+
+    def __init__(self, resolution: float, slots: int = 64) -> None:
+        if resolution <= 0:
+            raise ValueError("resolution must be greater than 0.")
+        if slots < 1:
+            raise ValueError("A timer wheel needs at least one slot.")
+
+        self._resolution = resolution
+        self._slots: list[set[str]] = [set() for _ in range(slots)]
+        self._deadlines: dict[str, float] = {}
+        self._slot_of: dict[str, int] = {}
+        self._tick: int | None = None
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._deadlines
+
+    @property
+    def resolution(self) -> float:
+        """The duration in seconds of a single slot."""
+        return self._resolution
+
+    def deadline(self, key: str) -> float | None:
+        """Return the deadline of a key, If it's scheduled."""
+        return self._deadlines.get(key)
+
+    def schedule(self, key: str, deadline: float) -> None:
+        """Schedule a key to expire at a deadline, Replacing its previous deadline if any."""
+        index = int(deadline / self._resolution) % len(self._slots)
+        previous = self._slot_of.get(key)
+        if previous != index:
+            if previous is not None:
+                self._slots[previous].discard(key)
+            self._slots[index].add(key)
+            self._slot_of[key] = index
+
+        self._deadlines[key] = deadline
+
+    def cancel(self, key: str) -> None:
+        """Stop tracking a key."""
+        index = self._slot_of.pop(key, None)
+        if index is not None:
+            self._slots[index].discard(key)
+            del self._deadlines[key]
+
+    def advance(self, now: float) -> collections.Sequence[str]:
+        """Advance the wheel to `now`, Removing and returning every key whose deadline passed."""
+        current = int(now / self._resolution)
+        if self._tick is None:
+            # Nothing can be overdue by more than a revolution on the first advance.
+            self._tick = current - len(self._slots)
+
+        if current < self._tick:
+            return ()
+
+        expired: list[str] = []
+        size = len(self._slots)
+        for tick in range(max(self._tick, current - size + 1), current + 1):
+            slot = self._slots[tick % size]
+            if not slot:
+                continue
+
+            for key in tuple(slot):
+                if self._deadlines[key] <= now:
+                    slot.discard(key)
+                    del self._deadlines[key]
+                    del self._slot_of[key]
+                    expired.append(key)
+
+        # The current slot may still hold keys due later within this tick.
+        self._tick = current
+        return expired
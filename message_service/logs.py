@@ -0,0 +1,184 @@
+# BSD 3-Clause License
+
+# Copyright (c) 2022-Present, nxtlo
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+
+# * Neither the name of the copyright holder nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Opt-in logging setup for applications running a gateway or devices.
+
+Importing this package never configures logging. Applications that want the bundled setup call `configure`,
+Which moves formatting and IO off the event loop to a background thread and rate limits per-device debug records.
+Records whose arguments could change before the thread formats them, i.e. a registry, Are still formatted
+before they're queued.
+
+Example
+-------
+```py
+listener = logs.configure(logging.DEBUG, structured=True)
+...
+listener.stop()
+```
+"""
+
+from __future__ import annotations
+
+
+__all__ = ("configure", "DeviceRateLimitFilter", "StructuredFormatter")
+
+import collections
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import time
+import typing
+
+_MAX_TRACKED_DEVICES: typing.Final[int] = 65_536
+_IMMUTABLE: typing.Final[tuple[type, ...]] = (str, bytes, int, float, type(None))
+
+
+class DeviceRateLimitFilter(logging.Filter):
+    """Let through at most one debug record per device every `interval` seconds.
+
+    Only records at `DEBUG` level carrying a `host_name` attribute, i.e. logged with `extra={"host_name": ...}`,
+    are limited. Other records always pass.
+
+    Parameters
+    ----------
+    interval : `float`
+        The minimum number of seconds between two debug records of the same device.
+    max_devices : `int`
+        The maximum number of devices to track, The least recently logged ones are forgotten first.
+    """
+
+    def __init__(self, interval: float = 1.0, max_devices: int = _MAX_TRACKED_DEVICES) -> None:
+        super().__init__()
+        self._interval = interval
+        self._max_devices = max_devices
+        self._last_seen: collections.OrderedDict[str, float] = collections.OrderedDict()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        host_name: str | None = getattr(record, "host_name", None)
+        if host_name is None or record.levelno > logging.DEBUG:
+            return True
+
+        now = time.monotonic()
+        last = self._last_seen.get(host_name)
+        if last is not None and now - last < self._interval:
+            return False
+
+        self._last_seen[host_name] = now
+        self._last_seen.move_to_end(host_name)
+        if len(self._last_seen) > self._max_devices:
+            self._last_seen.popitem(last=False)
+        return True
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """A queue handler that leaves formatting to the listener's thread.
+
+    `QueueHandler.prepare` formats every record on the logging thread, Here the record is only copied
+    unless its arguments are mutable, Since those could change before the listener formats them.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        args = record.args
+        if not isinstance(record.msg, str) or (
+            args and not (isinstance(args, tuple) and all(isinstance(arg, _IMMUTABLE) for arg in args))
+        ):
+            return super().prepare(record)
+
+        return copy.copy(record)
+
+
+class StructuredFormatter(logging.Formatter):
+    """Format records as single line JSON objects, Including the `host_name` and `signal` extras if present."""
+
+    _EXTRAS: typing.Final[tuple[str, ...]] = ("host_name", "ip_address", "signal")
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: dict[str, typing.Any] = {
+            "time": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for name in self._EXTRAS:
+            if (value := getattr(record, name, None)) is not None:
+                entry[name] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure(
+    level: int = logging.INFO,
+    *,
+    handler: logging.Handler | None = None,
+    structured: bool = False,
+    device_interval: float = 1.0,
+) -> logging.handlers.QueueListener:
+    """Route the root logger through a queue to a handler running in a background thread.
+
+    Records are formatted by that thread too, Unless their arguments are mutable objects
+    which are formatted before queueing so the thread sees them as they were when logged.
+
+    Parameters
+    ----------
+    level : `int`
+        The root logger level.
+    handler : `logging.Handler | None`
+        The handler doing the actual IO, Defaults to a `logging.StreamHandler` on stderr.
+    structured : `bool`
+        Whether to format records as JSON lines using `StructuredFormatter`.
+    device_interval : `float`
+        The minimum number of seconds between two debug records of the same device.
+
+    Returns
+    -------
+    `logging.handlers.QueueListener`
+        The started listener, Call `stop()` on it to flush the queue on shutdown.
+    """
+    target = handler or logging.StreamHandler()
+    if structured:
+        target.setFormatter(StructuredFormatter())
+    elif target.formatter is None:
+        target.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+
+    records: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    queue_handler = _DeferredQueueHandler(records)
+    # Filtering happens before the record is queued, So dropped records cost next to nothing.
+    queue_handler.addFilter(DeviceRateLimitFilter(device_interval))
+
+    root = logging.getLogger()
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    listener = logging.handlers.QueueListener(records, target, respect_handler_level=True)
+    listener.start()
+    return listener
@@ -0,0 +1,213 @@
+# BSD 3-Clause License
+
+# Copyright (c) 2022-Present, nxtlo
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+
+# * Neither the name of the copyright holder nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Hot path counters and histograms for the gateway and devices.
+
+Metrics are disabled unless a `Metrics` object is passed to a `Gateway` or a `Device`,
+In which case the hot paths skip them with a single `None` check.
+
+Everything is updated from the event loop thread only, So plain integers are used and no locks are taken.
+
+Example
+-------
+```py
+stats = metrics.Metrics()
+server = gateway.Gateway(metrics=stats)
+
+# Expose them at http://127.0.0.1:9100/metrics
+runner = await metrics.serve(stats, port=9100)
+```
+"""
+
+from __future__ import annotations
+
+
+__all__ = ("Histogram", "Metrics", "serve", "LATENCY_BUCKETS", "SIZE_BUCKETS")
+
+import bisect
+import collections
+import typing
+
+from . import enums
+
+if typing.TYPE_CHECKING:
+    import collections.abc as abc
+
+    from aiohttp import web
+
+LATENCY_BUCKETS: typing.Final[tuple[float, ...]] = (
+    1e-6,
+    5e-6,
+    1e-5,
+    5e-5,
+    1e-4,
+    5e-4,
+    1e-3,
+    5e-3,
+    1e-2,
+    5e-2,
+    0.1,
+    0.5,
+    1.0,
+)
+"""Default histogram buckets for durations, In seconds."""
+
+SIZE_BUCKETS: typing.Final[tuple[float, ...]] = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096)
+"""Default histogram buckets for sizes."""
+
+
+class Histogram:
+    """A fixed-bucket histogram.
+
+    Parameters
+    ----------
+    buckets : `Sequence[float]`
+        The sorted upper bounds of the buckets. An implicit `+Inf` bucket is always added.
+    """
+
+    __slots__ = ("_buckets", "_counts", "sum", "count")
+
+    def __init__(self, buckets: abc.Sequence[float] = LATENCY_BUCKETS) -> None:
+        self._buckets = tuple(buckets)
+        self._counts = [0] * (len(self._buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        """Record a value."""
+        self._counts[bisect.bisect_left(self._buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> list[tuple[float, int]]:
+        """Return each bucket's upper bound with the number of values less than or equal to it."""
+        total = 0
+        result: list[tuple[float, int]] = []
+        for bound, count in zip((*self._buckets, float("inf")), self._counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class Metrics:
+    """Counters and histograms collected by the gateway and devices.
+
+    A single object can be shared between a gateway and any number of devices running on the same loop.
+    """
+
+    __slots__ = (
+        "received",
+        "sent",
+        "send_errors",
+        "dropped",
+        "deferred",
+        "decode_seconds",
+        "dispatch_seconds",
+        "loop_lag_seconds",
+        "batch_size",
+    )
+
+    def __init__(self) -> None:
+        self.received: dict[enums.Signal, int] = dict.fromkeys(enums.Signal, 0)
+        """Messages received by the gateway per signal."""
+
+        self.sent: dict[enums.Signal, int] = dict.fromkeys(enums.Signal, 0)
+        """Messages sent by devices per signal."""
+
+        self.send_errors: collections.Counter[int] = collections.Counter()
+        """Failed device sends per errno."""
+
+        self.dropped: dict[enums.Signal, int] = dict.fromkeys(enums.Signal, 0)
+        """Messages dropped by a `ratelimit.RateLimiter` per signal."""
+
+        self.deferred: dict[enums.Signal, int] = dict.fromkeys(enums.Signal, 0)
+        """Messages deferred by a `ratelimit.RateLimiter` per signal."""
+
+        self.decode_seconds = Histogram()
+        """Time spent decoding each received batch."""
+
+        self.dispatch_seconds = Histogram()
+        """Time spent applying and dispatching each received batch."""
+
+        self.loop_lag_seconds = Histogram()
+        """How late the gateway's event loop wakes up compared to when it was scheduled to."""
+
+        self.batch_size = Histogram(SIZE_BUCKETS)
+        """Messages drained per receive wakeup, i.e. how deep the socket queue was when the gateway woke up."""
+
+    def render(self) -> str:
+        """Render these metrics in the Prometheus text exposition format."""
+        lines: list[str] = []
+
+        for name, counts in (
+            ("received", self.received),
+            ("sent", self.sent),
+            ("dropped", self.dropped),
+            ("deferred", self.deferred),
+        ):
+            lines.append(f"# TYPE batteries_messages_{name}_total counter")
+            lines.extend(
+                f'batteries_messages_{name}_total{{signal="{signal.name}"}} {count}'
+                for signal, count in counts.items()
+            )
+
+        lines.append("# TYPE batteries_send_errors_total counter")
+        lines.extend(
+            f'batteries_send_errors_total{{errno="{errno}"}} {count}' for errno, count in self.send_errors.items()
+        )
+
+        for name in ("decode_seconds", "dispatch_seconds", "loop_lag_seconds", "batch_size"):
+            histogram: Histogram = getattr(self, name)
+            lines.append(f"# TYPE batteries_{name} histogram")
+            for bound, count in histogram.cumulative():
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'batteries_{name}_bucket{{le="{le}"}} {count}')
+            lines.append(f"batteries_{name}_sum {histogram.sum}")
+            lines.append(f"batteries_{name}_count {histogram.count}")
+
+        return "\n".join(lines) + "\n"
+
+
+async def serve(metrics: Metrics, host: str = "127.0.0.1", port: int = 9100) -> web.AppRunner:
+    """Serve metrics at `http://{host}:{port}/metrics` in the Prometheus text format.
+
+    Call `cleanup()` on the returned runner to stop serving.
+    """
+    from aiohttp import web
+
+    async def handle(_: web.Request) -> web.Response:
+        return web.Response(text=metrics.render(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
@@ -0,0 +1,464 @@
+# BSD 3-Clause License
+
+# Copyright (c) 2022-Present, nxtlo
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+
+# * Neither the name of the copyright holder nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""Optional persistence of the gateway's device registry.
+
+Registry changes are appended to a log which is written and fsynced in batches from a worker thread,
+So at most `flush_interval` seconds of changes are lost on a crash and the event loop never waits on the disk.
+The log is periodically compacted into a snapshot of the whole registry, Which bounds the replay on startup
+to the snapshot plus the changes logged after it. Both are read through `mmap` when recovering.
+
+Files live in a single directory and are named by generation. A snapshot of generation N holds everything logged
+in generations before N.
+
+* `registry.<generation>.log`
+* `registry.<generation>.snapshot`
+
+Records are fixed layout binary with a CRC32 each, A torn record at the end of the log is discarded on recovery.
+
+Example
+-------
+```py
+store = persistence.RegistryStore("/var/lib/batteries")
+server = gateway.Gateway(store=store)
+```
+"""
+
+from __future__ import annotations
+
+
+__all__ = ("RegistryStore",)
+
+import asyncio
+import logging
+import mmap
+import os
+import pathlib
+import re
+import socket
+import struct
+import time
+import typing
+import zlib
+
+from . import devices, enums
+
+if typing.TYPE_CHECKING:
+    from . import registry
+
+_LOGGER = logging.getLogger("persistence")
+
+# crc32, Operation, Signal, IPv4 address, MAC address, Host name size, Followed by the host name.
+_RECORD = struct.Struct("!IBb4s6sB")
+_SNAPSHOT_HEADER = struct.Struct("!8sQ")
+_SNAPSHOT_MAGIC: typing.Final[bytes] = b"BATSNAP1"
+_FILE_NAME = re.compile(r"registry\.(\d{12})\.(log|snapshot)")
+
+_PUT: typing.Final[int] = 1
+_REMOVE: typing.Final[int] = 0
+_NO_ADDRESS: typing.Final[bytes] = bytes(10)
+_SIGNALS_BY_VALUE: typing.Final[dict[int, enums.Signal]] = {signal.value: signal for signal in enums.Signal}
+
+
+def _pack(operation: int, host_name: str, view: devices.DeviceView | None = None) -> bytes:
+    name = host_name.encode("UTF-8")
+    if view is None:
+        body = _RECORD.pack(0, operation, enums.Signal.CLOSE, _NO_ADDRESS[:4], _NO_ADDRESS[4:], len(name))[4:] + name
+    else:
+        body = (
+            _RECORD.pack(
+                0,
+                operation,
+                view.signal,
+                socket.inet_pton(socket.AF_INET, view.ip_address),
+                bytes.fromhex(view.mac_address.replace(":", "").replace("-", "")),
+                len(name),
+            )[4:]
+            + name
+        )
+    return zlib.crc32(body).to_bytes(4, "big") + body
+
+
+def _pack_view(view: devices.DeviceView) -> bytes:
+    """Pack a view, Or a removal if its addresses can't be stored so recovery doesn't bring back a stale view."""
+    try:
+        return _pack(_PUT, view.host_name, view)
+    except (OSError, ValueError):
+        # Only the binary codec validates addresses, Devices using the JSON codec can send anything.
+        _LOGGER.warning(
+            "Not persisting device %s, Its addresses %r and %r can't be stored",
+            view.host_name,
+            view.ip_address,
+            view.mac_address,
+            extra={"host_name": view.host_name},
+        )
+        return _pack(_REMOVE, view.host_name)
+
+
+def _replay(buffer: mmap.mmap, views: dict[str, devices.DeviceView], offset: int = 0) -> int:
+    """Apply the records in a buffer to `views`, Returning the offset of the first invalid or truncated record."""
+    end = len(buffer)
+    unpack = _RECORD.unpack_from
+    header_size = _RECORD.size
+    crc32 = zlib.crc32
+    ntop = socket.inet_ntop
+    view_type = devices.DeviceView
+    signals = _SIGNALS_BY_VALUE
+    while offset + header_size <= end:
+        crc, operation, signal, ip_address, mac_address, size = unpack(buffer, offset)
+        record_end = offset + header_size + size
+        # Slicing an mmap copies into bytes, Which is much cheaper than going through memoryview slices here.
+        record = buffer[offset + 4 : record_end]
+        if record_end > end or crc32(record) != crc:
+            break
+
+        host_name = record[header_size - 4 :].decode("UTF-8")
+        if operation == _PUT:
+            views[host_name] = view_type(
+                host_name, ntop(socket.AF_INET, ip_address), mac_address.hex(":"), signals[signal]
+            )
+        else:
+            views.pop(host_name, None)
+        offset = record_end
+
+    return offset
+
+
+class RegistryStore:
+    """An append-only log and snapshots of a device registry.
+
+    Parameters
+    ----------
+    directory : `str | os.PathLike[str]`
+        The directory to keep the files in, Created if missing.
+    flush_interval : `float`
+        The number of seconds between two batched writes and fsyncs of the log.
+    snapshot_interval : `float`
+        The maximum number of seconds between two snapshots, If anything was logged in between.
+    compact_after : `int`
+        Take a snapshot early once this many records were logged since the last one.
+    """
+
+    __slots__ = (
+        "_directory",
+        "_flush_interval",
+        "_snapshot_interval",
+        "_compact_after",
+        "_generation",
+        "_buffer",
+        "_records",
+        "_last_snapshot",
+        "_log",
+        "_registry",
+        "_flusher",
+        "_io_lock",
+    )
+
+    def __init__(
+        self,
+        directory: str | os.PathLike[str],
+        *,
+        flush_interval: float = 0.05,
+        snapshot_interval: float = 300.0,
+        compact_after: int = 1_000_000,
+    ) -> None:
+        self._directory = pathlib.Path(directory)
+        self._flush_interval = flush_interval
+        self._snapshot_interval = snapshot_interval
+        self._compact_after = compact_after
+        self._generation = 0
+        self._buffer = bytearray()
+        # Records logged since the last snapshot.
+        self._records = 0
+        self._last_snapshot = time.monotonic()
+        self._log: typing.BinaryIO | None = None
+        self._registry: registry.DeviceRegistry | None = None
+        self._flusher: asyncio.Task[None] | None = None
+        self._io_lock = asyncio.Lock()
+
+    @property
+    def directory(self) -> pathlib.Path:
+        """The directory the files are kept in."""
+        return self._directory
+
+    @property
+    def generation(self) -> int:
+        """The generation of the log currently appended to."""
+        return self._generation
+
+    async def open(self, registry: registry.DeviceRegistry) -> int:
+        """Recover the persisted devices into a registry, Then start logging changes.
+
+        Returns
+        -------
+        `int`
+            The number of recovered devices.
+        """
+        if self._log is not None:
+            raise RuntimeError("Store is already open.")
+
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        views = await loop.run_in_executor(None, self._recover)
+        for view in views.values():
+            registry.put(view)
+
+        self._registry = registry
+        self._last_snapshot = time.monotonic()
+        self._flusher = asyncio.create_task(self._flush_periodically())
+        _LOGGER.info("Recovered %d devices in %.3fs", len(views), time.perf_counter() - started)
+        return len(views)
+
+    async def close(self) -> None:
+        """Write the pending changes and stop logging."""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+
+        await self.flush()
+        async with self._io_lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+        self._registry = None
+
+    def put(self, view: devices.DeviceView) -> None:
+        """Log that a device was registered or its view changed."""
+        try:
+            self._buffer += _pack_view(view)
+        except struct.error:
+            _LOGGER.warning("Not persisting device %s, Its host name is too long", view.host_name)
+            return
+        self._records += 1
+
+    def remove(self, host_name: str) -> None:
+        """Log that a device was unregistered."""
+        try:
+            self._buffer += _pack(_REMOVE, host_name)
+        except struct.error:
+            _LOGGER.warning("Not persisting device %s, Its host name is too long", host_name)
+            return
+        self._records += 1
+
+    async def flush(self) -> None:
+        """Write and fsync the pending changes."""
+        async with self._io_lock:
+            if not self._buffer or self._log is None:
+                return
+
+            data, self._buffer = self._buffer, bytearray()
+            await asyncio.get_running_loop().run_in_executor(None, self._write, self._log, data)
+
+    async def snapshot(self) -> None:
+        """Snapshot the registry and delete the logs and snapshots it supersedes."""
+        if self._registry is None:
+            raise RuntimeError("Store is not open.")
+
+        async with self._io_lock:
+            # Taken together so the snapshot holds exactly the changes logged before it.
+            views = tuple(self._registry.values())
+            data, self._buffer = self._buffer, bytearray()
+            generation = self._generation + 1
+
+            loop = asyncio.get_running_loop()
+            rotation = loop.run_in_executor(None, self._rotate, self._log, data, views, generation)
+            cancelled = False
+            while True:
+                try:
+                    new_log = await asyncio.shield(rotation)
+                    break
+                except asyncio.CancelledError:
+                    if rotation.cancelled():
+                        raise
+                    # The thread carries on regardless, So its outcome is still applied before cancelling.
+                    cancelled = True
+                except Exception:
+                    # The old log is still in use, Writing these again is harmless since replaying is idempotent.
+                    self._buffer[:0] = data
+                    raise
+
+            self._log, self._generation = new_log, generation
+            self._records = 0
+            self._last_snapshot = time.monotonic()
+            if cancelled:
+                raise asyncio.CancelledError
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self._flush_interval)
+            try:
+                await self.flush()
+                if self._records >= self._compact_after or (
+                    self._records and time.monotonic() - self._last_snapshot >= self._snapshot_interval
+                ):
+                    await self.snapshot()
+            except Exception:
+                _LOGGER.exception("Failed to persist the device registry")
+
+    # These run in a worker thread.
+
+    def _path(self, generation: int, kind: str) -> pathlib.Path:
+        return self._directory / f"registry.{generation:012d}.{kind}"
+
+    def _files(self) -> list[tuple[int, str, pathlib.Path]]:
+        files: list[tuple[int, str, pathlib.Path]] = []
+        for path in self._directory.iterdir():
+            if match := _FILE_NAME.fullmatch(path.name):
+                files.append((int(match[1]), match[2], path))
+        return sorted(files)
+
+    def _recover(self) -> dict[str, devices.DeviceView]:
+        self._directory.mkdir(parents=True, exist_ok=True)
+        files = self._files()
+        views: dict[str, devices.DeviceView] = {}
+
+        snapshots = [(generation, path) for generation, kind, path in files if kind == "snapshot"]
+        base = 0
+        # Fall back to an older snapshot if the newest one is unreadable.
+        for generation, path in reversed(snapshots):
+            if self._load_snapshot(path, views):
+                base = generation
+                break
+            views.clear()
+
+        logs = [(generation, path) for generation, kind, path in files if kind == "log" and generation >= base]
+        for generation, path in logs:
+            valid = self._load_log(path, views)
+            if valid != path.stat().st_size:
+                _LOGGER.warning("Discarding a torn record at the end of %s", path)
+                os.truncate(path, valid)
+
+        self._generation = logs[-1][0] if logs else base
+        self._log = open(self._path(self._generation, "log"), "ab", buffering=0)
+        return views
+
+    @staticmethod
+    def _map(path: pathlib.Path) -> mmap.mmap | None:
+        with open(path, "rb") as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return None
+            return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _load_snapshot(self, path: pathlib.Path, views: dict[str, devices.DeviceView]) -> bool:
+        mapped = self._map(path)
+        if mapped is None:
+            return False
+
+        with mapped:
+            if len(mapped) < _SNAPSHOT_HEADER.size:
+                return False
+
+            magic, count = _SNAPSHOT_HEADER.unpack_from(mapped)
+            if magic != _SNAPSHOT_MAGIC:
+                return False
+
+            valid = _replay(mapped, views, _SNAPSHOT_HEADER.size) == len(mapped)
+
+        return valid and len(views) == count
+
+    def _load_log(self, path: pathlib.Path, views: dict[str, devices.DeviceView]) -> int:
+        mapped = self._map(path)
+        if mapped is None:
+            return 0
+
+        with mapped:
+            return _replay(mapped, views)
+
+    @staticmethod
+    def _write(log: typing.BinaryIO, data: bytes | bytearray) -> None:
+        log.write(data)
+        os.fsync(log.fileno())
+
+    def _rotate(
+        self,
+        old_log: typing.BinaryIO | None,
+        data: bytearray,
+        views: tuple[devices.DeviceView, ...],
+        generation: int,
+    ) -> typing.BinaryIO:
+        if old_log is not None:
+            # Keep the old log complete and open until the snapshot replacing it is in place.
+            self._write(old_log, data)
+
+        log_path = self._path(generation, "log")
+        new_log = open(log_path, "ab", buffering=0)
+
+        path = self._path(generation, "snapshot")
+        partial = path.with_name(path.name + ".partial")
+        records: list[bytes] = []
+        for view in views:
+            try:
+                records.append(_pack(_PUT, view.host_name, view))
+            except (OSError, ValueError, struct.error):
+                # Its removal was already logged by `put`, It isn't part of the recovered registry either.
+                continue
+
+        try:
+            with open(partial, "wb") as file:
+                file.write(_SNAPSHOT_HEADER.pack(_SNAPSHOT_MAGIC, len(records)))
+                file.write(b"".join(records))
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(partial, path)
+        except BaseException:
+            # The old log stays the current one, So the new generation must not be recovered.
+            new_log.close()
+            log_path.unlink(missing_ok=True)
+            partial.unlink(missing_ok=True)
+            raise
+
+        if old_log is not None:
+            old_log.close()
+
+        # The new generation is in place, So failing to clean up after it only leaves stale files behind.
+        try:
+            self._sync_directory()
+            for old_generation, _, old_path in self._files():
+                if old_generation < generation:
+                    old_path.unlink(missing_ok=True)
+        except OSError:
+            _LOGGER.warning("Failed to clean up the files superseded by generation %d", generation, exc_info=True)
+
+        return new_log
+
+    def _sync_directory(self) -> None:
+        if not hasattr(os, "O_DIRECTORY"):
+            return
+
+        descriptor = os.open(self._directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(descriptor)
+        finally:
+            os.close(descriptor)
@@ -0,0 +1,221 @@
+# BSD 3-Clause License
+
+# Copyright (c) 2022-Present, nxtlo
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+
+# * Neither the name of the copyright holder nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""A connection pool that multiplexes many devices over a few sockets."""
+
+from __future__ import annotations
+
+
+__all__ = ("DevicePool",)
+
+import asyncio
+import collections
+import logging
+import typing
+import zlib
+
+import zmq
+import zmq.asyncio
+
+from . import config
+
+if typing.TYPE_CHECKING:
+    import collections.abc as abc
+
+_LOGGER = logging.getLogger("pool")
+
+if typing.TYPE_CHECKING:
+    _Pending = tuple[abc.Sequence[bytes | zmq.Frame], asyncio.Future[None]]
+
+
+class _Lane:
+    """A single pooled socket that fair-queues the sends of the devices pinned to it.
+
+    Each device has its own queue and the lane sends one message per device in a round-robin,
+    So a chatty device can't starve the others sharing the same socket.
+    """
+
+    __slots__ = ("_socket", "_queues", "_ready", "_wakeup", "_task")
+
+    def __init__(self, socket: zmq.asyncio.Socket) -> None:
+        self._socket = socket
+        self._queues: dict[str, collections.deque[_Pending]] = {}
+        self._ready: collections.deque[str] = collections.deque()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def send(self, key: str, frames: abc.Sequence[bytes | zmq.Frame]) -> None:
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = collections.deque()
+            self._ready.append(key)
+
+        queue.append((frames, future))
+        self._wakeup.set()
+        await future
+
+    async def _run(self) -> None:
+        while True:
+            if not self._ready:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            key = self._ready.popleft()
+            queue = self._queues[key]
+            frames, future = queue.popleft()
+            if queue:
+                self._ready.append(key)
+            else:
+                del self._queues[key]
+
+            try:
+                await self._socket.send_multipart(frames, copy=False)
+            except zmq.ZMQError as exc:
+                if not future.done():
+                    future.set_exception(exc)
+            else:
+                if not future.done():
+                    future.set_result(None)
+
+    async def close(self) -> None:
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+        for queue in self._queues.values():
+            for _, future in queue:
+                if not future.done():
+                    future.set_exception(RuntimeError("Pool closed..."))
+
+        self._queues.clear()
+        self._ready.clear()
+        self._socket.close()
+
+
+class DevicePool:
+    """Share one ZeroMQ context and a small pool of sockets between many devices.
+
+    Each device is pinned to one of the pool's sockets by its host name, Which keeps its signals in order.
+    Devices sharing a socket are fair-queued so each gets a turn.
+
+    Example
+    -------
+    ```py
+    shared = pool.DevicePool(size=4)
+    await shared.open()
+
+    fleet = [devices.Device(pool=shared) for _ in range(500)]
+    for device in fleet:
+        await device.open()
+    ```
+
+    Parameters
+    ----------
+    endpoint : `str | None`
+        The gateway endpoint to connect to, Defaults to `tcp://127.0.0.1:5555`.
+    size : `int`
+        The number of sockets in the pool.
+    socket_config : `config.SocketConfig | None`
+        Options applied to the context and every pooled socket.
+    """
+
+    __slots__ = ("_endpoint", "_size", "_socket_config", "_context", "_lanes")
+
+    def __init__(
+        self,
+        endpoint: str | None = None,
+        *,
+        size: int = 4,
+        socket_config: config.SocketConfig | None = None,
+    ) -> None:
+        if size < 1:
+            raise ValueError("A pool needs at least one socket.")
+
+        self._endpoint = endpoint or "tcp://127.0.0.1:5555"
+        self._size = size
+        self._socket_config = socket_config or config.DEFAULT
+        self._context = self._socket_config.make_context()
+        self._lanes: list[_Lane] = []
+
+    @property
+    def endpoint(self) -> str:
+        return self._endpoint
+
+    @property
+    def is_alive(self) -> bool:
+        return bool(self._lanes)
+
+    @property
+    def size(self) -> int:
+        """The number of sockets in this pool."""
+        return self._size
+
+    @property
+    def context(self) -> zmq.asyncio.Context:
+        """The context shared by the pooled sockets, Devices using the pool create their other sockets from it."""
+        return self._context
+
+    async def open(self) -> None:
+        if self._lanes:
+            raise RuntimeError("This pool is already running.")
+
+        for _ in range(self._size):
+            socket = self._context.socket(zmq.PUSH)
+            self._socket_config.apply(socket)
+            socket.connect(self._endpoint)
+            self._lanes.append(_Lane(socket))
+
+        _LOGGER.info("Opened %d pooled connections to %s", self._size, self._endpoint)
+
+    async def close(self) -> None:
+        if not self._lanes:
+            raise RuntimeError("Pool is already closed.")
+
+        for lane in self._lanes:
+            await lane.close()
+
+        self._lanes.clear()
+
+    async def send(self, host_name: str, frames: abc.Sequence[bytes | zmq.Frame]) -> None:
+        """Send a multipart message on behalf of a device.
+
+        This waits until the message was handed to ZeroMQ.
+        """
+        await self._lane_for(host_name).send(host_name, frames)
+
+    def _lane_for(self, host_name: str) -> _Lane:
+        if not self._lanes:
+            raise RuntimeError("Pool is closed...")
+
+        return self._lanes[zlib.crc32(host_name.encode("UTF-8")) % len(self._lanes)]
@@ -0,0 +1,296 @@
+# BSD 3-Clause License
+
+# Copyright (c) 2022-Present, nxtlo
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+
+# * Neither the name of the copyright holder nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Per-device rate limiting for the gateway.
+
+Each device gets a token bucket per limited signal, So a device spamming `Signal.RESTART` runs out of
+restarts without losing its heartbeats. Buckets are kept as GCRA theoretical arrival times, A bucket is a
+single float that holds the time at which it will be full again, And a device's buckets are packed into one array.
+
+Buckets are kept in least recently used order and bounded by `max_devices`. A device whose buckets are all
+full again is indistinguishable from one that was never seen, So idle devices are evicted first at no cost.
+
+Example
+-------
+```py
+limiter = ratelimit.RateLimiter(
+    {enums.Signal.RESTART: ratelimit.Limit(1, burst=3), enums.Signal.OPEN: ratelimit.Limit(1, burst=5, defer=True)},
+    default=ratelimit.Limit(50, burst=100),
+)
+server = gateway.Gateway(rate_limiter=limiter)
+```
+"""
+
+from __future__ import annotations
+
+
+__all__ = ("Limit", "RateLimiter")
+
+import array
+import collections
+import dataclasses
+import types
+import typing
+
+from . import enums
+
+if typing.TYPE_CHECKING:
+    import collections.abc as abc
+
+    from . import devices, metrics
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Limit:
+    """The rate a device may send a signal at.
+
+    Parameters
+    ----------
+    rate : `float`
+        The sustained number of messages per second.
+    burst : `int`
+        The number of messages that can be sent back to back before `rate` applies, Defaults to `1`.
+    defer : `bool`
+        Whether messages over the limit are deferred instead of dropped, Defaults to `False`.
+        Only a device's latest deferred message of each signal is kept, It's dispatched once the device is
+        under its limit and dropped if the device sends a newer message of the same signal that gets through first.
+        Messages of other signals, i.e. heartbeats, Never affect it.
+    """
+
+    rate: float
+    burst: int = 1
+    defer: bool = False
+
+    def __post_init__(self) -> None:
+        if self.rate <= 0:
+            raise ValueError("rate must be greater than 0.")
+        if self.burst < 1:
+            raise ValueError("burst must be greater than 0.")
+
+
+class RateLimiter:
+    """Token bucket rate limits per device and signal.
+
+    Everything is updated from the event loop thread only, So no locks are taken.
+
+    Parameters
+    ----------
+    limits : `collections.Mapping[enums.Signal, Limit | None] | None`
+        The limit of each signal. A signal mapped to `None` is never limited.
+    default : `Limit | None`
+        The limit of the signals missing from `limits`, Defaults to `None` which doesn't limit them.
+    max_devices : `int`
+        The maximum number of devices to keep buckets for, The least recently seen ones are evicted first.
+    metrics : `metrics.Metrics | None`
+        If provided, Dropped and deferred messages are counted into it instead of into this limiter.
+    """
+
+    __slots__ = (
+        "_limits",
+        "_index",
+        "_intervals",
+        "_tolerances",
+        "_buckets",
+        "_deferring",
+        "_max_devices",
+        "_pending",
+        "dropped",
+        "deferred",
+    )
+
+    def __init__(
+        self,
+        limits: abc.Mapping[enums.Signal, Limit | None] | None = None,
+        *,
+        default: Limit | None = None,
+        max_devices: int = 65_536,
+        metrics: metrics.Metrics | None = None,
+    ) -> None:
+        if max_devices < 1:
+            raise ValueError("max_devices must be greater than 0.")
+
+        limits = limits or {}
+        self._limits: dict[enums.Signal, Limit] = {}
+        for signal in enums.Signal:
+            limit = limits[signal] if signal in limits else default
+            if limit is not None:
+                self._limits[signal] = limit
+
+        # Each limited signal owns a slot in a device's bucket array.
+        self._index = {signal: slot for slot, signal in enumerate(self._limits)}
+        self._intervals = [1 / limit.rate for limit in self._limits.values()]
+        self._tolerances = [(limit.burst - 1) / limit.rate for limit in self._limits.values()]
+        self._buckets: collections.OrderedDict[str, array.array[float]] = collections.OrderedDict()
+        self._deferring = tuple(signal for signal, limit in self._limits.items() if limit.defer)
+        self._max_devices = max_devices
+        self._pending: dict[tuple[str, enums.Signal], devices.DeviceView] = {}
+
+        self.dropped: dict[enums.Signal, int] = metrics.dropped if metrics else dict.fromkeys(enums.Signal, 0)
+        """Messages dropped per signal."""
+
+        self.deferred: dict[enums.Signal, int] = metrics.deferred if metrics else dict.fromkeys(enums.Signal, 0)
+        """Messages deferred per signal."""
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def __contains__(self, host_name: object) -> bool:
+        return host_name in self._buckets
+
+    @property
+    def limits(self) -> abc.Mapping[enums.Signal, Limit]:
+        """The limit of each limited signal."""
+        return types.MappingProxyType(self._limits)
+
+    @property
+    def release_interval(self) -> float:
+        """How often in seconds `release` should be called, So deferred messages wait at most one of their intervals.
+
+        Never more than a second, So idle devices are still evicted when nothing is deferred.
+        """
+        deferring = (interval for interval, limit in zip(self._intervals, self._limits.values()) if limit.defer)
+        return min(1.0, min(deferring, default=1.0))
+
+    @property
+    def pending(self) -> abc.Mapping[tuple[str, enums.Signal], devices.DeviceView]:
+        """The deferred message of each device and signal that has one."""
+        return types.MappingProxyType(self._pending)
+
+    def admit(self, view: devices.DeviceView, now: float) -> bool:
+        """Take a token for a received message, Returning whether it should be dispatched now.
+
+        A message over its limit is either dropped or deferred, See `Limit.defer`.
+
+        Parameters
+        ----------
+        view : `devices.DeviceView`
+            The received message.
+        now : `float`
+            The current `time.monotonic()`.
+        """
+        slot = self._index.get(view.signal)
+        if slot is None:
+            return True
+
+        host_name = view.host_name
+
+        buckets = self._buckets.get(host_name)
+        if buckets is None:
+            buckets = self._add(host_name)
+        else:
+            self._buckets.move_to_end(host_name)
+
+        key = (host_name, view.signal)
+        if self._take(buckets, slot, now):
+            # A newer message of the same signal supersedes the deferred one.
+            if self._pending and key in self._pending:
+                self._drop(self._pending.pop(key))
+            return True
+
+        if self._limits[view.signal].defer:
+            if (superseded := self._pending.pop(key, None)) is not None:
+                self._drop(superseded)
+            self._pending[key] = view
+            self.deferred[view.signal] += 1
+        else:
+            self._drop(view)
+
+        return False
+
+    def release(self, now: float) -> list[devices.DeviceView]:
+        """Remove and return the deferred messages whose devices are under their limit again.
+
+        Parameters
+        ----------
+        now : `float`
+            The current `time.monotonic()`.
+        """
+        released: list[devices.DeviceView] = []
+        for key, view in tuple(self._pending.items()):
+            buckets = self._buckets[view.host_name]
+            if self._take(buckets, self._index[view.signal], now):
+                del self._pending[key]
+                released.append(view)
+
+        return released
+
+    def evict_idle(self, now: float) -> int:
+        """Evict the devices whose buckets are all full again, Returning how many were evicted.
+
+        Parameters
+        ----------
+        now : `float`
+            The current `time.monotonic()`.
+        """
+        evicted = 0
+        buckets = self._buckets
+        # Least recently seen devices come first, So this stops at the first device that isn't idle.
+        while buckets:
+            host_name, arrivals = next(iter(buckets.items()))
+            if max(arrivals) > now or self._is_deferring(host_name):
+                break
+
+            del buckets[host_name]
+            evicted += 1
+
+        return evicted
+
+    def clear(self) -> None:
+        """Forget every bucket and deferred message."""
+        self._buckets.clear()
+        self._pending.clear()
+
+    def _add(self, host_name: str) -> array.array[float]:
+        if len(self._buckets) >= self._max_devices:
+            evicted, _ = self._buckets.popitem(last=False)
+            for signal in self._deferring:
+                if (view := self._pending.pop((evicted, signal), None)) is not None:
+                    self._drop(view)
+
+        # Arrival times in the past are full buckets.
+        buckets = array.array("d", bytes(8 * len(self._index)))
+        self._buckets[host_name] = buckets
+        return buckets
+
+    def _is_deferring(self, host_name: str) -> bool:
+        return bool(self._pending) and any((host_name, signal) in self._pending for signal in self._deferring)
+
+    def _take(self, buckets: array.array[float], slot: int, now: float) -> bool:
+        arrival = buckets[slot]
+        if arrival < now:
+            arrival = now
+        elif arrival - now > self._tolerances[slot]:
+            return False
+
+        buckets[slot] = arrival + self._intervals[slot]
+        return True
+
+    def _drop(self, view: devices.DeviceView) -> None:
+        self.dropped[view.signal] += 1
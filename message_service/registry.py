@@ -0,0 +1,282 @@
+# BSD 3-Clause License
+
+# Copyright (c) 2022-Present, nxtlo
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+
+# * Neither the name of the copyright holder nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""The gateway's device registry."""
+
+from __future__ import annotations
+
+
+__all__ = ("DeviceRegistry",)
+
+import collections.abc as collections
+import typing
+import zlib
+
+from . import codecs, devices, index
+
+if typing.TYPE_CHECKING:
+    from . import enums, traits
+
+    Buffer = bytes | bytearray | memoryview
+
+
+K = typing.TypeVar("K")
+
+
+class DeviceRegistry(collections.Mapping[str, "devices.DeviceView"]):
+    """A mapping from each registered device host name to its latest view.
+
+    Views of registered devices are reused for as long as nothing about them changes, And the identity
+    frames they send are cached so known devices aren't decoded again. When only the signal changes,
+    The new view shares the strings of the old one.
+
+    The registry also indexes devices by IP address and MAC address, And maintains secondary indexes
+    by IPv4 network, MAC vendor prefix and last signal for `query`.
+
+    Parameters
+    ----------
+    codec : `traits.Codec | None`
+        The codec used to decode identity frames, Defaults to the binary codec.
+    """
+
+    __slots__ = (
+        "_codec",
+        "_views",
+        "_by_ip",
+        "_by_mac",
+        "_identities",
+        "_identity_of",
+        "_by_network",
+        "_by_oui",
+        "_by_signal",
+    )
+
+    def __init__(self, codec: traits.Codec | None = None) -> None:
+        self._codec = codec or codecs.BINARY
+        self._views: dict[str, devices.DeviceView] = {}
+        # Addresses aren't unique, Random private IPs and NAT can give several devices the same one.
+        self._by_ip: dict[str, set[str]] = {}
+        self._by_mac: dict[str, set[str]] = {}
+        # CRC32 of an encoded identity -> host name, Only for registered devices.
+        # Hashing the received frame in place means known identities are never copied out of it.
+        self._identities: dict[int, str] = {}
+        self._identity_of: dict[str, bytes] = {}
+        self._by_network = index.IPv4Trie()
+        self._by_oui = index.OUIIndex()
+        self._by_signal: dict[enums.Signal, set[str]] = {}
+
+    def __getitem__(self, host_name: str) -> devices.DeviceView:
+        return self._views[host_name]
+
+    def __iter__(self) -> collections.Iterator[str]:
+        return iter(self._views)
+
+    def __len__(self) -> int:
+        return len(self._views)
+
+    def __contains__(self, host_name: object) -> bool:
+        return host_name in self._views
+
+    def __repr__(self) -> str:
+        return f"DeviceRegistry({self._views!r})"
+
+    def by_ip(self, ip_address: str) -> list[devices.DeviceView]:
+        """Return the devices registered with this IP address."""
+        return [self._views[host_name] for host_name in self._by_ip.get(ip_address, ())]
+
+    def by_mac(self, mac_address: str) -> list[devices.DeviceView]:
+        """Return the devices registered with this MAC address."""
+        return [self._views[host_name] for host_name in self._by_mac.get(mac_address, ())]
+
+    def query(
+        self,
+        *,
+        network: str | None = None,
+        oui: str | None = None,
+        signal: enums.Signal | None = None,
+    ) -> list[devices.DeviceView]:
+        """Return the registered devices matching every given filter.
+
+        Each filter is answered by its own index and the smallest candidate set is checked against the others,
+        So the cost follows the size of the result rather than the size of the registry.
+
+        Parameters
+        ----------
+        network : `str | None`
+            An IPv4 network the device's address is in, e.g. `10.2.0.0/16`.
+        oui : `str | None`
+            The MAC vendor prefix of the device, e.g. `00:1a:2b`.
+        signal : `enums.Signal | None`
+            The last signal the device sent.
+
+        Raises
+        ------
+        `ValueError`
+            If `network` or `oui` is invalid.
+        """
+        candidates: list[collections.Set[str]] = []
+        if network is not None:
+            candidates.append(self._by_network.search(network))
+        if oui is not None:
+            candidates.append(self._by_oui.search(oui))
+        if signal is not None:
+            candidates.append(self._by_signal.get(signal, frozenset()))
+
+        if not candidates:
+            return list(self._views.values())
+
+        candidates.sort(key=len)
+        smallest, *others = candidates
+        return [self._views[host] for host in smallest if all(host in other for other in others)]
+
+    def resolve(self, identity: Buffer, signal: enums.Signal) -> devices.DeviceView:
+        """Return a view for an encoded identity and the signal it sent.
+
+        The identity can be any object that supports the buffer protocol, Including a received `zmq.Frame`.
+
+        If the device is registered and nothing changed, The registered view itself is returned.
+        A known identity is never decoded, And when a registered device's identity changed,
+        The fields that didn't change keep sharing the registered strings.
+        """
+        host_name = self._identities.get(zlib.crc32(identity))
+        if host_name is not None:
+            cached = self._identity_of[host_name]
+            # Compares the buffers without copying, A CRC collision decodes the identity instead.
+            if len(cached) != len(identity) or not cached.startswith(identity):
+                host_name = None
+
+        if host_name is None:
+            decoded = self._codec.decode_identity(memoryview(identity))
+            view = self._views.get(decoded.host_name)
+            if view is None:
+                return devices.DeviceView(decoded.host_name, decoded.ip_address, decoded.mac_address, signal)
+
+            ip_address, mac_address = view.ip_address, view.mac_address
+            if ip_address != decoded.ip_address or mac_address != decoded.mac_address:
+                # The device changed its addresses, The cached identity is replaced once this view is put.
+                return devices.DeviceView(
+                    view.host_name,
+                    ip_address if ip_address == decoded.ip_address else decoded.ip_address,
+                    mac_address if mac_address == decoded.mac_address else decoded.mac_address,
+                    signal,
+                )
+
+            self._cache_identity(view.host_name, bytes(identity))
+        else:
+            view = self._views[host_name]
+
+        if view.signal is signal:
+            return view
+
+        return devices.DeviceView(view.host_name, view.ip_address, view.mac_address, signal)
+
+    def put(self, view: devices.DeviceView) -> bool:
+        """Register a view or replace the registered view of the same device.
+
+        Returns `True` if the registry changed.
+        """
+        host_name = view.host_name
+        old = self._views.get(host_name)
+        if old is view:
+            return False
+
+        # The secondary indexes are updated before anything is committed, Addresses they can't index are skipped.
+        ip_changed = old is None or old.ip_address != view.ip_address
+        if ip_changed:
+            if old is not None:
+                self._by_network.discard(old.ip_address, host_name)
+            self._by_network.add(view.ip_address, host_name)
+
+        mac_changed = old is None or old.mac_address != view.mac_address
+        if mac_changed:
+            if old is not None:
+                self._by_oui.discard(old.mac_address, host_name)
+            self._by_oui.add(view.mac_address, host_name)
+
+        self._views[host_name] = view
+        if ip_changed:
+            if old is not None:
+                self._unindex(self._by_ip, old.ip_address, host_name)
+            self._by_ip.setdefault(view.ip_address, set()).add(host_name)
+
+        if mac_changed:
+            if old is not None:
+                self._unindex(self._by_mac, old.mac_address, host_name)
+            self._by_mac.setdefault(view.mac_address, set()).add(host_name)
+
+        if old is None or old.signal is not view.signal:
+            if old is not None:
+                self._unindex(self._by_signal, old.signal, host_name)
+            self._by_signal.setdefault(view.signal, set()).add(host_name)
+
+        if old is not None and (ip_changed or mac_changed):
+            self._uncache_identity(host_name)
+
+        return True
+
+    def remove(self, host_name: str) -> devices.DeviceView | None:
+        """Unregister a device, Returning its last view if it was registered."""
+        view = self._views.pop(host_name, None)
+        if view is None:
+            return None
+
+        self._unindex(self._by_ip, view.ip_address, host_name)
+        self._unindex(self._by_mac, view.mac_address, host_name)
+        self._by_network.discard(view.ip_address, host_name)
+        self._by_oui.discard(view.mac_address, host_name)
+        self._unindex(self._by_signal, view.signal, host_name)
+        self._uncache_identity(host_name)
+        return view
+
+    def clear(self) -> None:
+        """Unregister every device."""
+        for mapping in (self._views, self._by_ip, self._by_mac, self._identities, self._identity_of, self._by_signal):
+            mapping.clear()
+        self._by_network = index.IPv4Trie()
+        self._by_oui = index.OUIIndex()
+
+    def _cache_identity(self, host_name: str, identity: bytes) -> None:
+        self._uncache_identity(host_name)
+        # On a collision the first device keeps the slot, The other one is decoded on every message.
+        if self._identities.setdefault(zlib.crc32(identity), host_name) == host_name:
+            self._identity_of[host_name] = identity
+
+    def _uncache_identity(self, host_name: str) -> None:
+        identity = self._identity_of.pop(host_name, None)
+        if identity is not None:
+            del self._identities[zlib.crc32(identity)]
+
+    @staticmethod
+    def _unindex(index: dict[K, set[str]], key: K, host_name: str) -> None:
+        hosts = index.get(key)
+        if hosts is not None:
+            hosts.discard(host_name)
+            if not hosts:
+                del index[key]
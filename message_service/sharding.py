@@ -0,0 +1,526 @@
+# BSD 3-Clause License
+
+# Copyright (c) 2022-Present, nxtlo
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+
+# * Neither the name of the copyright holder nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""A multi-process gateway that shards devices across worker processes.
+
+The front-end binds the public address, Hashes each message's host name onto a consistent hash ring
+and forwards it to the worker that owns that device. Since a device always maps to the same worker
+and each worker is fed through a single ordered pipe, The order of a device's signals is preserved.
+
+Workers report registry changes back to the parent, Which keeps a merged read-only view of their registries.
+Other signals are only reported while the parent has listeners or waiters for them, So a fleet of
+heartbeating devices doesn't cost the parent anything unless something listens to `HELLO`.
+
+Workers talk to the front-end over `ipc://` endpoints, So this is only available where ZeroMQ supports IPC.
+"""
+
+from __future__ import annotations
+
+
+__all__ = ("HashRing", "ShardedGateway")
+
+import asyncio
+import bisect
+import collections
+import hashlib
+import logging
+import multiprocessing
+import os
+import shutil
+import struct
+import tempfile
+import types
+import typing
+
+import zmq
+import zmq.asyncio
+
+from . import codecs, config, enums, events, gateway, traits, utils
+from . import devices as devices_
+
+if typing.TYPE_CHECKING:
+    import collections.abc as abc
+    import multiprocessing.process
+
+_LOGGER = logging.getLogger("sharding")
+
+_ADDED: typing.Final[bytes] = b"+"
+_REMOVED: typing.Final[bytes] = b"-"
+_UNCHANGED: typing.Final[bytes] = b"="
+_REPORT: typing.Final[struct.Struct] = struct.Struct("!cBBHH")
+"""A report header, Its kind, The device's signal, The dispatched signal and the host name and IP address sizes."""
+_MAX_ROUTES: typing.Final[int] = 65_536
+"""The maximum number of identities whose worker is remembered."""
+_REPORT_RETRY: typing.Final[float] = 0.01
+"""Seconds to wait before retrying reports the parent couldn't take yet."""
+
+
+def _hash(key: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "big")
+
+
+def _pack_signals(signals: abc.Iterable[enums.Signal]) -> bytes:
+    return bytes(sorted(signals))
+
+
+class HashRing:
+    """A consistent hash ring mapping keys to node indexes.
+
+    Parameters
+    ----------
+    nodes : `int`
+        The number of nodes on the ring.
+    replicas : `int`
+        The number of virtual points per node. More points give a more even distribution.
+    """
+
+    __slots__ = ("_points", "_nodes", "_size")
+
+    def __init__(self, nodes: int, replicas: int = 128) -> None:
+        if nodes < 1:
+            raise ValueError("A hash ring needs at least one node.")
+
+        ring = sorted(
+            (_hash(f"{node}:{replica}".encode()), node) for node in range(nodes) for replica in range(replicas)
+        )
+        self._points = [point for point, _ in ring]
+        self._nodes = [node for _, node in ring]
+        self._size = nodes
+
+    def __len__(self) -> int:
+        return self._size
+
+    def node_for(self, key: bytes) -> int:
+        """Return the index of the node that owns this key."""
+        index = bisect.bisect(self._points, _hash(key))
+        return self._nodes[index if index < len(self._points) else 0]
+
+
+class _ShardWorker(gateway.Gateway):
+    """A gateway running in a worker process that reports registry changes and listened signals to the parent."""
+
+    __slots__ = ("_report_address", "_report", "_unsent", "_retry", "_control_address", "_follower", "_forwarded")
+
+    def __init__(
+        self,
+        address: str,
+        report_address: str,
+        control_address: str,
+        forwarded: frozenset[enums.Signal],
+        **kwargs: typing.Any,
+    ) -> None:
+        super().__init__(address, **kwargs)
+        self._report_address = report_address
+        # Reports are sent without blocking from the receive loop, So this is a plain socket.
+        self._report: zmq.Socket[bytes] | None = None
+        self._unsent: collections.deque[bytes] = collections.deque()
+        self._retry: asyncio.TimerHandle | None = None
+        self._control_address = control_address
+        self._follower: asyncio.Task[None] | None = None
+        # The signals the parent has listeners or waiters for.
+        self._forwarded = forwarded
+
+    async def open(self) -> None:
+        self._report = zmq.Socket(self._context, zmq.PUSH)
+        self._socket_config.apply(self._report)
+        self._report.connect(self._report_address)
+
+        control = self._context.socket(zmq.PULL)
+        self._socket_config.apply(control)
+        control.bind(self._control_address)
+        self._follower = asyncio.create_task(self._follow(control))
+        await super().open()
+
+    async def close(self) -> None:
+        if self._follower is not None:
+            self._follower.cancel()
+            self._follower = None
+        if self._retry is not None:
+            self._retry.cancel()
+            self._retry = None
+        self._unsent.clear()
+        if self._report is not None:
+            self._report.close()
+            self._report = None
+        await super().close()
+
+    def _apply(self, dev: devices_.DeviceView, signal: enums.Signal | None = None) -> None:
+        known = self._devices.get(dev.host_name)
+        super()._apply(dev, signal)
+        current = self._devices.get(dev.host_name)
+
+        dispatched = dev.signal if signal is None else signal
+        if self._report is None or (current is known and dispatched not in self._forwarded):
+            return
+
+        if current is known:
+            kind = _UNCHANGED
+        else:
+            kind = _ADDED if current is not None else _REMOVED
+
+        host_name, ip_address = dev.host_name.encode(), dev.ip_address.encode()
+        self._unsent.append(
+            _REPORT.pack(kind, dev.signal, dispatched, len(host_name), len(ip_address))
+            + host_name
+            + ip_address
+            + dev.mac_address.encode()
+        )
+        if self._retry is None:
+            self._send_reports()
+
+    async def _follow(self, control: zmq.asyncio.Socket) -> None:
+        try:
+            while True:
+                self._forwarded = frozenset(map(enums.Signal, await control.recv()))
+        finally:
+            control.close()
+
+    def _send_reports(self) -> None:
+        self._retry = None
+        if self._report is None:
+            return
+
+        unsent = self._unsent
+        while unsent:
+            try:
+                self._report.send(unsent[0], zmq.NOBLOCK)
+            except zmq.Again:
+                # The parent is behind, Keep the reports in order and retry them shortly.
+                self._retry = asyncio.get_running_loop().call_later(_REPORT_RETRY, self._send_reports)
+                return
+            except zmq.ZMQError as exc:
+                _LOGGER.warning("Dropping a report that couldn't be sent to the parent: %s", exc)
+
+            unsent.popleft()
+
+
+def _run_worker(
+    address: str,
+    report_address: str,
+    control_address: str,
+    forwarded: bytes,
+    codec_name: str,
+    loop: str,
+    options: dict[str, typing.Any],
+) -> None:
+    worker = _ShardWorker(
+        address,
+        report_address,
+        control_address,
+        frozenset(map(enums.Signal, forwarded)),
+        codec=codecs.get_codec(codec_name),
+        **options,
+    )
+    try:
+        utils.run(worker.open(), loop_factory=loop)
+    except KeyboardInterrupt:
+        pass
+
+
+class ShardedGateway(traits.Pull):
+    """A gateway that spreads devices across multiple worker processes.
+
+    Parameters
+    ----------
+    address : `str | None`
+        The public address devices connect to, Defaults to `tcp://127.0.0.1:5555`.
+    codec : `traits.Codec | None`
+        The codec used by devices, Defaults to the binary codec.
+    shards : `int | None`
+        The number of worker processes, Defaults to the number of CPUs.
+    batch_size : `int`
+        The maximum number of messages routed per wakeup, Also passed to each worker.
+    batch_time_budget : `float | None`
+        The maximum time in seconds to spend draining a single batch, Also passed to each worker.
+    socket_config : `config.SocketConfig | None`
+        Options applied to the front-end and worker sockets.
+    max_listener_concurrency : `int`
+        The maximum number of coroutine listeners running at the same time.
+    loop : `str`
+        The name of the event loop the workers run on, See `utils.get_loop_factory`. Defaults to `auto`,
+        Which runs them on uvloop if it's installed.
+    """
+
+    __slots__ = (
+        "_context",
+        "_address",
+        "_codec",
+        "_ring",
+        "_batch_size",
+        "_batch_time_budget",
+        "_socket_config",
+        "_devices",
+        "_view",
+        "_front",
+        "_report",
+        "_shards",
+        "_controls",
+        "_forwarded",
+        "_workers",
+        "_directory",
+        "_loop",
+        "_dispatcher",
+    )
+
+    def __init__(
+        self,
+        address: str | None = None,
+        codec: traits.Codec | None = None,
+        *,
+        shards: int | None = None,
+        batch_size: int = 256,
+        batch_time_budget: float | None = 0.005,
+        socket_config: config.SocketConfig | None = None,
+        max_listener_concurrency: int = 64,
+        loop: str = "auto",
+    ) -> None:
+        if loop not in utils.LOOPS:
+            raise LookupError(f"Unknown event loop {loop!r}, Expected one of {utils.LOOPS}")
+
+        self._address = address or "tcp://127.0.0.1:5555"
+        self._codec = codec or codecs.BINARY
+        self._ring = HashRing(shards or os.cpu_count() or 1)
+        self._batch_size = batch_size
+        self._batch_time_budget = batch_time_budget
+        self._socket_config = socket_config or config.DEFAULT
+        self._context = self._socket_config.make_context()
+
+        self._devices: dict[str, devices_.DeviceView] = {}
+        self._view = types.MappingProxyType(self._devices)
+
+        self._front: zmq.asyncio.Socket | None = None
+        self._report: zmq.asyncio.Socket | None = None
+        self._shards: list[zmq.asyncio.Socket] = []
+        # Tell each worker which signals to report besides registry changes.
+        self._controls: list[zmq.Socket[bytes]] = []
+        self._forwarded = b""
+        self._workers: list[multiprocessing.process.BaseProcess] = []
+        self._directory: str | None = None
+        self._loop = loop
+        self._dispatcher = events.EventDispatcher(max_listener_concurrency)
+
+    @property
+    def is_alive(self) -> bool:
+        return self._front is not None
+
+    @property
+    def endpoint(self) -> str:
+        return self._address
+
+    @property
+    def shards(self) -> int:
+        """The number of worker processes."""
+        return len(self._ring)
+
+    @property
+    def devices(self) -> abc.Mapping[str, devices_.DeviceView]:
+        """A merged read-only view of the devices owned by every worker."""
+        return self._view
+
+    async def listen(self, signal: enums.Signal, callback: events.Callback) -> None:
+        """Listen for a device signal to occur in any worker.
+
+        Callbacks run in this process once the worker that applied the signal reported it,
+        Regular callbacks are called inline within the report loop so they must be fast.
+        Workers only report the signal while something listens to it, So listening to `HELLO` costs
+        the parent a report for every heartbeat.
+
+        Parameters
+        ----------
+        signal : `enums.Signal`
+            The signal to listen to.
+        callback : `events.Callback`
+            The callback to call with the view of the device that sent the signal.
+        """
+        self._dispatcher.subscribe(signal, callback)
+        self._forward()
+
+    def remove_listener(self, signal: enums.Signal, callback: events.Callback) -> None:
+        """Remove a callback that was registered with `listen`."""
+        self._dispatcher.unsubscribe(signal, callback)
+        self._forward()
+
+    async def wait_for(
+        self,
+        signal: enums.Signal,
+        predicate: abc.Callable[[devices_.DeviceView], bool] | None = None,
+        timeout: float | None = None,
+    ) -> devices_.DeviceView:
+        """Wait for a single device signal to occur in any worker.
+
+        Parameters
+        ----------
+        signal : `enums.Signal`
+            The signal to wait for.
+        predicate : `Callable[[DeviceView], bool] | None`
+            An optional check the device must pass.
+        timeout : `float | None`
+            Seconds to wait before raising `asyncio.TimeoutError`.
+        """
+        waiting = self._dispatcher.wait_for(signal, predicate, timeout)
+        self._forward()
+        try:
+            return await waiting
+        finally:
+            self._forward()
+
+    def shard_for(self, host_name: str) -> int:
+        """Return the index of the worker that owns a device."""
+        return self._ring.node_for(host_name.encode("UTF-8"))
+
+    async def open(self) -> None:
+        if self._front is not None:
+            raise RuntimeError("Socket is already running.")
+
+        self._directory = tempfile.mkdtemp(prefix="batteries-")
+        report_address = f"ipc://{self._directory}/report"
+        self._report = self._context.socket(zmq.PULL)
+        self._socket_config.apply(self._report)
+        self._report.bind(report_address)
+
+        self._forwarded = _pack_signals(self._dispatcher.signals())
+        options = {
+            "batch_size": self._batch_size,
+            "batch_time_budget": self._batch_time_budget,
+            "socket_config": self._socket_config,
+        }
+        # Forking a process that already has a ZeroMQ context is unsafe.
+        spawn = multiprocessing.get_context("spawn")
+        for index in range(len(self._ring)):
+            address = f"ipc://{self._directory}/shard-{index}"
+            control_address = f"ipc://{self._directory}/control-{index}"
+            worker = spawn.Process(
+                target=_run_worker,
+                args=(address, report_address, control_address, self._forwarded, self._codec.name, self._loop, options),
+                name=f"gateway-shard-{index}",
+                daemon=True,
+            )
+            worker.start()
+            self._workers.append(worker)
+
+            shard = self._context.socket(zmq.PUSH)
+            self._socket_config.apply(shard)
+            shard.connect(address)
+            self._shards.append(shard)
+
+            control = zmq.Socket(self._context, zmq.PUSH)
+            self._socket_config.apply(control)
+            control.connect(control_address)
+            self._controls.append(control)
+
+        self._front = self._context.socket(zmq.PULL)
+        self._socket_config.apply(self._front)
+        self._front.bind(self._address)
+
+        _LOGGER.info("Sharded gateway running with %d workers...", len(self._workers))
+        await asyncio.gather(self._route(), self._merge())
+
+    async def close(self) -> None:
+        if self._front is None:
+            raise RuntimeError("Socket is already closed.")
+
+        for socket in (self._front, self._report, *self._shards):
+            if socket is not None:
+                socket.close()
+        for control in self._controls:
+            control.close()
+
+        for worker in self._workers:
+            worker.terminate()
+        for worker in self._workers:
+            worker.join()
+
+        if self._directory:
+            shutil.rmtree(self._directory, ignore_errors=True)
+
+        self._front = None
+        self._report = None
+        self._directory = None
+        self._shards.clear()
+        self._controls.clear()
+        self._workers.clear()
+        self._dispatcher.cancel()
+
+    async def _route(self) -> None:
+        assert self._front is not None
+        front, ring, codec, shards = self._front, self._ring, self._codec, self._shards
+        # Sending on plain sockets skips a future per message, The asyncio socket only waits on a full pipe.
+        pipes: list[zmq.Socket[bytes]] = [zmq.Socket.shadow(shard.underlying) for shard in shards]
+        # Devices keep sending the same identity, So its worker is only hashed once.
+        routes: dict[bytes, int] = {}
+        while True:
+            for frames in await gateway.recv_batch(front, self._batch_size, self._batch_time_budget):
+                identity = frames[0].bytes
+                index = routes.get(identity)
+                if index is None:
+                    if len(routes) >= _MAX_ROUTES:
+                        routes.clear()
+                    index = routes[identity] = ring.node_for(codec.route_key(identity))
+
+                try:
+                    pipes[index].send_multipart(frames, zmq.NOBLOCK, copy=False)
+                except zmq.Again:
+                    await shards[index].send_multipart(frames, copy=False)
+
+    def _forward(self) -> None:
+        """Tell the workers which signals to report, If that changed."""
+        forwarded = _pack_signals(self._dispatcher.signals())
+        if forwarded == self._forwarded:
+            return
+
+        self._forwarded = forwarded
+        for control in self._controls:
+            try:
+                control.send(forwarded, zmq.NOBLOCK)
+            except zmq.ZMQError as exc:
+                _LOGGER.warning("Couldn't tell a worker which signals to report: %s", exc)
+
+    async def _merge(self) -> None:
+        assert self._report is not None
+        report, registry, dispatch = self._report, self._devices, self._dispatcher.dispatch
+        header_size = _REPORT.size
+        while True:
+            for frames in await gateway.recv_batch(report, self._batch_size):
+                data = frames[0].bytes
+                kind, signal, dispatched, host_size, ip_size = _REPORT.unpack_from(data)
+                ip_offset = header_size + host_size
+                mac_offset = ip_offset + ip_size
+                view = devices_.DeviceView(
+                    host_name=data[header_size:ip_offset].decode(),
+                    ip_address=data[ip_offset:mac_offset].decode(),
+                    mac_address=data[mac_offset:].decode(),
+                    signal=enums.Signal(signal),
+                )
+                if kind == _ADDED:
+                    registry[view.host_name] = view
+                elif kind == _REMOVED:
+                    registry.pop(view.host_name, None)
+
+                dispatch(enums.Signal(dispatched), view)
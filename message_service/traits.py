@@ -36,8 +36,9 @@ import typing
 import collections.abc as collections
 
 if typing.TYPE_CHECKING:
+    from . import codecs
     from . import enums
-    from . import devices
+    from . import devices as devices_
 
 
 @typing.runtime_checkable
@@ -70,7 +71,7 @@ class Pull(Runnable, typing.Protocol):
     """A `PULL` socket type protocol. This is considered as the main server that listenes to `PUSH` sockets (Devices)."""
 
     @property
-    def devices(self) -> collections.Mapping[str, devices.DeviceView]:
+    def devices(self) -> collections.Mapping[str, devices_.DeviceView]:
         """A mapping from each device hostname to a view of that device."""
         raise NotImplementedError
 
@@ -83,6 +84,15 @@ class Pull(Runnable, typing.Protocol):
         """
         raise NotImplementedError
 
+    async def wait_for(
+        self,
+        signal: enums.Signal,
+        predicate: collections.Callable[[devices_.DeviceView], bool] | None = None,
+        timeout: float | None = None,
+    ) -> devices_.DeviceView:
+        """Wait for a single device signal that matches the predicate to occur."""
+        raise NotImplementedError
+
 
 @typing.runtime_checkable
 class Push(Runnable, typing.Protocol):
@@ -106,3 +116,32 @@ class Push(Runnable, typing.Protocol):
     async def signal(self, signal: enums.Signal) -> None:
         """Send a signal to the gateway for this device."""
         raise NotImplementedError
+
+    async def signal_many(self, signals: collections.Iterable[enums.Signal]) -> None:
+        """Send multiple signals to the gateway for this device in a single message."""
+        raise NotImplementedError
+
+
+@typing.runtime_checkable
+class Codec(typing.Protocol):
+    """A wire codec that encodes device identities into bytes and decodes them back.
+
+    Signals are not part of the identity, They're sent as separate single byte frames.
+    """
+
+    @property
+    def name(self) -> str:
+        """The name of this codec."""
+        raise NotImplementedError
+
+    def encode_identity(self, device: Push) -> bytes:
+        """Encode the identity of a device into bytes."""
+        raise NotImplementedError
+
+    def decode_identity(self, buffer: bytes | bytearray | memoryview) -> codecs.Identity:
+        """Decode a received identity frame."""
+        raise NotImplementedError
+
+    def route_key(self, buffer: bytes | bytearray | memoryview) -> bytes:
+        """Return the encoded host name of an identity frame without fully decoding it."""
+        raise NotImplementedError
@@ -35,19 +35,132 @@ __all__ = (
     "generate_random_mac_address",
     "generate_random_hostname",
     "get_or_make_loop",
+    "get_loop_factory",
+    "run",
+    "LoopFactory",
+    "LOOPS",
 )
 
 import asyncio
+import collections.abc as collections
+import sys
 import typing
 
-import faker
-import faker.providers.internet as internet
+from . import identities
 
+T = typing.TypeVar("T")
 T_co = typing.TypeVar("T_co", covariant=True)
 
+LoopFactory = collections.Callable[[], asyncio.AbstractEventLoop]
+"""A callable that creates a new event loop."""
 
-def get_or_make_loop() -> asyncio.AbstractEventLoop:
+LOOPS: typing.Final[tuple[str, ...]] = ("auto", "uvloop", "asyncio")
+"""The event loop names accepted by `get_loop_factory`."""
+
+
+def _asyncio_loop_factory() -> LoopFactory:
+    # ZeroMQ sockets need add_reader, Which the default proactor loop on Windows doesn't implement.
+    if sys.platform == "win32":
+        return asyncio.SelectorEventLoop
+    return asyncio.new_event_loop
+
+
+def get_loop_factory(name: str = "auto") -> LoopFactory:
+    """Get an event loop factory by its name.
+
+    uvloop is imported only when asked for, So it stays an optional dependency.
+
+    Parameters
+    ----------
+    name : `str`
+        The event loop name, Defaults to `auto`.
+
+        * `auto` - uvloop if it's installed, Otherwise the standard library loop.
+        * `uvloop` - uvloop, Raises `ImportError` if it isn't installed.
+        * `asyncio` - The standard library loop, A selector loop on Windows.
+
+    Raises
+    ------
+    `LookupError`
+        If the event loop name is unknown.
+    """
+    if name == "asyncio":
+        return _asyncio_loop_factory()
+
+    if name == "uvloop":
+        import uvloop
+
+        return uvloop.new_event_loop
+
+    if name == "auto":
+        try:
+            import uvloop
+        except ImportError:
+            return _asyncio_loop_factory()
+
+        return uvloop.new_event_loop
+
+    raise LookupError(f"Unknown event loop {name!r}, Expected one of {LOOPS}")
+
+
+def run(
+    main: collections.Coroutine[typing.Any, typing.Any, T], *, loop_factory: LoopFactory | str | None = None
+) -> T:
+    """Run a coroutine to completion in a new event loop, Like `asyncio.run`.
+
+    Parameters
+    ----------
+    main : `collections.Coroutine[typing.Any, typing.Any, T]`
+        The coroutine to run.
+    loop_factory : `LoopFactory | str | None`
+        The event loop factory or its name, See `get_loop_factory`. Defaults to `auto`.
+    """
+    if not callable(loop_factory):
+        loop_factory = get_loop_factory(loop_factory or "auto")
+
+    if sys.version_info >= (3, 11):
+        with asyncio.Runner(loop_factory=loop_factory) as runner:
+            return runner.run(main)
+
+    # asyncio.Runner is 3.11+, This mirrors what it and asyncio.run do on 3.10.
+    loop = loop_factory()
+    try:
+        asyncio.set_event_loop(loop)
+        return loop.run_until_complete(main)
+    finally:
+        try:
+            _cancel_all_tasks(loop)
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.run_until_complete(loop.shutdown_default_executor())
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+
+
+def _cancel_all_tasks(loop: asyncio.AbstractEventLoop) -> None:
+    tasks = asyncio.all_tasks(loop)
+    if not tasks:
+        return
+
+    for task in tasks:
+        task.cancel()
+
+    loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+    for task in tasks:
+        if not task.cancelled() and (exc := task.exception()) is not None:
+            loop.call_exception_handler(
+                {"message": "Unhandled exception during utils.run() shutdown", "exception": exc, "task": task}
+            )
+
+
+def get_or_make_loop(loop_factory: LoopFactory | None = None) -> asyncio.AbstractEventLoop:
     """Get the current usable event loop or create a new one.
+
+    Parameters
+    ----------
+    loop_factory : `LoopFactory | None`
+        The factory to create the new loop with, Defaults to `get_loop_factory()`.
+
     Returns
     -------
     asyncio.AbstractEventLoop
@@ -64,7 +177,7 @@ def get_or_make_loop() -> asyncio.AbstractEventLoop:
     except RuntimeError:
         pass
 
-    loop = asyncio.new_event_loop()
+    loop = (loop_factory or get_loop_factory())()
     asyncio.set_event_loop(loop)
     return loop
 
@@ -101,20 +214,16 @@ async def all_of(
             pass
 
 
-_fake = faker.Faker()
-_fake.add_provider(internet)
-
-
 def generate_random_ipv4_address() -> str:
-    """Generate a random IPv4 address."""
-    return _fake.ipv4_private()
+    """Generate a random IPv4 address, See `identities.random_ipv4_address`."""
+    return identities.random_ipv4_address()
 
 
 def generate_random_mac_address() -> str:
-    """Generate a random MAC address."""
-    return _fake.mac_address()
+    """Generate a random MAC address, See `identities.random_mac_address`."""
+    return identities.random_mac_address()
 
 
 def generate_random_hostname() -> str:
-    """Generate a random hostname."""
-    return _fake.hostname(0)
+    """Generate a random hostname, See `identities.random_host_name`."""
+    return identities.random_host_name()
@@ -0,0 +1,131 @@
+# BSD 3-Clause License
+
+# Copyright (c) 2022-Present, nxtlo
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# * Redistributions of source code must retain the above copyright notice, this
+  # list of conditions and the following disclaimer.
+
+# * Redistributions in binary form must reproduce the above copyright notice,
+  # this list of conditions and the following disclaimer in the documentation
+  # and/or other materials provided with the distribution.
+
+# * Neither the name of the copyright holder nor the names of its
+  # contributors may be used to endorse or promote products derived from
+  # this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Run a local cluster of gateways over ipc:// and a few devices spread across them.
+
+Half of the devices close again, Then every node must converge on the other half.
+
+python run_cluster.py [nodes] [devices]
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import queue
+import shutil
+import sys
+import tempfile
+import time
+
+from message_service import cluster, devices, enums, logs, utils
+
+_CONVERGENCE_TIMEOUT = 30.0
+
+
+def _run_node(index: int, directory: str, nodes: int, counts: "multiprocessing.Queue[tuple[str, int]]") -> None:
+  logs.configure(logging.INFO)
+  node = cluster.ClusterGateway(
+    f"ipc://{directory}/gateway-{index}",
+    publish_address=f"ipc://{directory}/publish-{index}",
+    peers=[f"ipc://{directory}/publish-{peer}" for peer in range(nodes) if peer != index],
+    node_id=f"node-{index}",
+  )
+
+  async def report() -> None:
+    while True:
+      await asyncio.sleep(0.5)
+      counts.put((node.node_id, len(node.devices)))
+
+  async def main() -> None:
+    asyncio.create_task(report())
+    await node.open()
+
+  try:
+    utils.run(main())
+  except KeyboardInterrupt:
+    pass
+
+
+async def _run_devices(directory: str, nodes: int, count: int) -> None:
+  endpoints = [f"ipc://{directory}/gateway-{index}" for index in range(nodes)]
+  fleet = [devices.Device(endpoint=endpoints) for _ in range(count)]
+  for dev in fleet:
+    await dev.open()
+    await dev.signal(enums.Signal.OPEN)
+
+  await asyncio.sleep(5)
+  for dev in fleet[: count // 2]:
+    await dev.close()
+
+
+def _wait_for_convergence(
+  counts: "multiprocessing.Queue[tuple[str, int]]", nodes: int, expected: int
+) -> dict[str, int]:
+  seen: dict[str, int] = {}
+  deadline = time.monotonic() + _CONVERGENCE_TIMEOUT
+  while time.monotonic() < deadline:
+    try:
+      node_id, size = counts.get(timeout=max(0.0, deadline - time.monotonic()))
+    except queue.Empty:
+      break
+
+    seen[node_id] = size
+    if len(seen) == nodes and all(size == expected for size in seen.values()):
+      return seen
+
+  raise AssertionError(f"The cluster didn't converge on {expected} devices, Nodes see {seen}")
+
+
+if __name__ == "__main__":
+  nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+  count = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+  directory = tempfile.mkdtemp(prefix="batteries-cluster-")
+
+  spawn = multiprocessing.get_context("spawn")
+  counts: "multiprocessing.Queue[tuple[str, int]]" = spawn.Queue()
+  workers = [
+    spawn.Process(target=_run_node, args=(index, directory, nodes, counts), daemon=True) for index in range(nodes)
+  ]
+  for worker in workers:
+    worker.start()
+
+  try:
+    utils.run(_run_devices(directory, nodes, count))
+    # Every node should settle on count - count // 2 devices.
+    converged = _wait_for_convergence(counts, nodes, count - count // 2)
+    print(f"Converged on {count - count // 2} devices: {converged}")
+  except KeyboardInterrupt:
+    pass
+  finally:
+    for worker in workers:
+      worker.terminate()
+    for worker in workers:
+      worker.join()
+    shutil.rmtree(directory, ignore_errors=True)
@@ -29,13 +29,10 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 
+import argparse
 import asyncio
-import sys
 
-from message_service import devices, enums
-
-if sys.platform == 'win32':
-    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+from message_service import devices, enums, utils
 
 async def start() -> None:
   dev = devices.Device()
@@ -50,5 +47,6 @@ async def start() -> None:
   await dev.close()
 
 if __name__ == "__main__":
-  asyncio.run(start())
-
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--loop", default="auto", choices=utils.LOOPS, help="The event loop to run on.")
+  utils.run(start(), loop_factory=parser.parse_args().loop)
@@ -28,18 +28,23 @@
 # OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
-import asyncio
-import sys
+import argparse
+import logging
 
-from message_service import gateway
-
-if sys.platform == 'win32':
-    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+from message_service import gateway, logs, utils
 
 if __name__ == "__main__":
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--loop", default="auto", choices=utils.LOOPS, help="The event loop to run on.")
+  args = parser.parse_args()
+
+  listener = logs.configure(logging.DEBUG)
   server = gateway.Gateway()
 
   async def main() -> None:
     await server.open()
 
-  asyncio.run(main())
+  try:
+    utils.run(main(), loop_factory=args.loop)
+  finally:
+    listener.stop()